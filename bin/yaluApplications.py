@@ -0,0 +1,221 @@
+#!/usr/bin/python
+ ##############################################################################
+################################################################################
+####            YetAnotherLevelUp (YALU), an FVWM Configuration             ####
+####               ~ Jonathan Heathcote                                     ####
+####               ~ September 2009 - Present                               ####
+####               ~ GNU GPLv3                                              ####
+################################################################################
+ ##############################################################################
+# yaluApplications:
+#   Indexes the installed applications (the XDG .desktop files) for the
+#   launcher's Applications menus. Syntax:
+#      yaluApplications [category]
+#   Prints the categories which have applications or, if a category is given,
+#   the "name<TAB>command" of each application in it.
+#
+#   The applications directories in XDG_DATA_HOME and XDG_DATA_DIRS are parsed
+#   into an index which is cached in LocalYALU and only rebuilt when one of the
+#   directories (or their sub-directories) changes. Applications are grouped by
+#   the main categories of the XDG menu specification, those with none of them
+#   are put in "Other".
+
+from __future__ import print_function
+
+import sys, os, marshal
+
+import yaluTheme
+
+# The main categories (in the order they're shown) and their labels
+mainCategories = [
+	("AudioVideo", "Multimedia"),
+	("Development", "Development"),
+	("Education", "Education"),
+	("Game", "Games"),
+	("Graphics", "Graphics"),
+	("Network", "Internet"),
+	("Office", "Office"),
+	("Science", "Science"),
+	("Settings", "Settings"),
+	("System", "System"),
+	("Utility", "Accessories"),
+	("Other", "Other"),
+]
+
+# The category for applications without any of the main categories
+otherCategory = "Other"
+
+def applicationDirectories():
+	"""Return the XDG applications directories (most important first)"""
+	dataHome = os.environ.get("XDG_DATA_HOME") \
+	           or os.path.join(os.path.expanduser("~"), ".local", "share")
+	dataDirs = os.environ.get("XDG_DATA_DIRS") or "/usr/local/share:/usr/share"
+	return [os.path.join(directory, "applications")
+	        for directory in [dataHome] + dataDirs.split(":")
+	        if directory != ""]
+
+################################################################################
+# Desktop entry parsing                                                        #
+################################################################################
+def readDesktopEntry(filename):
+	"""
+	Return a dictionary of the keys in the [Desktop Entry] group of a .desktop
+	file (translations are ignored).
+	"""
+	data = open(filename, "rb").read()
+	if not isinstance(data, str):
+		data = data.decode("utf-8", "replace")
+	
+	entry = {}
+	inGroup = False
+	for line in data.split("\n"):
+		line = line.strip()
+		if line.startswith("["):
+			inGroup = line == "[Desktop Entry]"
+		elif inGroup and "=" in line and not line.startswith("#"):
+			key, _, value = line.partition("=")
+			key = key.strip()
+			if "[" not in key:
+				entry[key] = value.strip()
+	return entry
+
+def stripFieldCodes(command):
+	"""Remove the %f, %U etc. field codes from a desktop entry's Exec key"""
+	words = []
+	for word in command.split(" "):
+		if len(word) == 2 and word.startswith("%") and word != "%%":
+			continue
+		words.append(word.replace("%%", "%"))
+	return " ".join(words).strip()
+
+def parseApplication(filename):
+	"""
+	Return the (name, command, icon, terminal, categories) of the application
+	described by a .desktop file, or None if it shouldn't be shown.
+	"""
+	try:
+		entry = readDesktopEntry(filename)
+	except IOError:
+		return None
+	
+	if entry.get("Type", "Application") != "Application" \
+	   or entry.get("NoDisplay") == "true" \
+	   or entry.get("Hidden") == "true" \
+	   or not entry.get("Name") \
+	   or not stripFieldCodes(entry.get("Exec", "")):
+		return None
+	
+	categories = [category for category in entry.get("Categories", "").split(";")
+	              if category in dict(mainCategories)]
+	return (entry["Name"],
+	        stripFieldCodes(entry["Exec"]),
+	        entry.get("Icon", ""),
+	        entry.get("Terminal") == "true",
+	        categories or [otherCategory])
+
+################################################################################
+# Application Index Object                                                     #
+################################################################################
+class ApplicationIndex:
+	def __init__(self, directories, cacheFile="applicationIndex"):
+		self.directories = directories
+		
+		# Use the cached index if none of the directories it was built from have
+		# changed
+		try:
+			cache = marshal.loads(open(cacheFile, "rb").read())
+		except (IOError, EOFError, ValueError, TypeError):
+			cache = {}
+		
+		# Indexes from other versions of Python have the wrong string type
+		if cache.get("python") == sys.version_info[0] \
+		   and cache.get("directories") == directories \
+		   and all(self.__mtime(directory) == mtime
+		           for directory, mtime in cache.get("mtimes", {}).items()):
+			self.categories = cache["categories"]
+		else:
+			mtimes = {}
+			self.categories = self.__buildIndex(mtimes)
+			yaluTheme.writeAtomically(cacheFile, marshal.dumps({
+				"python" : sys.version_info[0],
+				"directories" : directories,
+				"mtimes" : mtimes,
+				"categories" : self.categories,
+			}))
+	
+	def __mtime(self, directory):
+		try:
+			return os.stat(directory).st_mtime
+		except OSError:
+			return None
+	
+	def __buildIndex(self, mtimes):
+		"""
+		Return a dictionary {category: [(name, command, icon, terminal), ...]}
+		sorted by name. The mtime of each directory read is put into mtimes.
+		"""
+		# Desktop entries are identified by their path relative to the
+		# applications directory. Earlier directories take priority.
+		applications = {}
+		for topDirectory in self.directories:
+			mtimes[topDirectory] = self.__mtime(topDirectory)
+			for directory, subDirectories, filenames in os.walk(topDirectory):
+				mtimes[directory] = self.__mtime(directory)
+				for filename in filenames:
+					path = os.path.join(directory, filename)
+					desktopId = os.path.relpath(path, topDirectory)
+					if filename.endswith(".desktop") \
+					   and desktopId not in applications:
+						applications[desktopId] = parseApplication(path)
+		
+		categories = {}
+		for application in applications.values():
+			if application is not None:
+				name, command, icon, terminal, applicationCategories = application
+				for category in applicationCategories:
+					categories.setdefault(category, []).append(
+						(name, command, icon, terminal))
+		for category in categories:
+			categories[category].sort(key=lambda application:
+			                          application[0].lower())
+		return categories
+	
+	def getCategories(self):
+		"""Return the (category, label) of each category with applications"""
+		return [(category, label) for category, label in mainCategories
+		        if category in self.categories]
+	
+	def getApplications(self, category):
+		"""Return the (name, command, icon, terminal) of each application"""
+		return self.categories.get(category, [])
+
+# The index (created when first used)
+loadedApplicationIndex = None
+
+def getApplicationIndex():
+	"""Return the ApplicationIndex for the XDG applications directories"""
+	global loadedApplicationIndex
+	if loadedApplicationIndex is None:
+		loadedApplicationIndex = ApplicationIndex(applicationDirectories())
+	return loadedApplicationIndex
+
+################################################################################
+# Commandline behaviour.                                                       #
+################################################################################
+
+def main(argv):
+	# Move into the YALU dir so that all paths from now on can be relative
+	os.chdir(os.environ["LocalYALU"])
+	
+	if len(argv) == 1:
+		for category, label in getApplicationIndex().getCategories():
+			print(category)
+	elif len(argv) == 2:
+		for name, command, icon, terminal in \
+		    getApplicationIndex().getApplications(argv[1]):
+			print("%s\t%s"%(name, command))
+	else:
+		sys.stderr.write("Usage: yaluApplications [category]\n")
+
+if __name__ == "__main__":
+	main(sys.argv)
@@ -0,0 +1,72 @@
+#!/usr/bin/python
+ ##############################################################################
+################################################################################
+####            YetAnotherLevelUp (YALU), an FVWM Configuration             ####
+####               ~ Jonathan Heathcote                                     ####
+####               ~ September 2009 - Present                               ####
+####               ~ GNU GPLv3                                              ####
+################################################################################
+ ##############################################################################
+# yaluBuild:
+#   Builds the bundle of precompiled scripts which yaluPy runs. Syntax:
+#      yaluBuild bundleFile
+#   The bundle is a zip of every script in bin/ compiled by the Python running
+#   yaluBuild along with a __main__ which runs the script named by the first
+#   argument, i.e.
+#      python bundleFile yaluMenu launcher
+#   does the same as "yaluMenu.py launcher" but without searching for or
+#   compiling any of the scripts.
+#
+#   Only the compiled scripts are included: tracebacks still show the source
+#   as each script is compiled with its filename in bin/.
+
+import sys, os, zipfile, py_compile, tempfile, shutil
+
+# Runs the script named in the first argument
+bundleMain = """
+import sys
+module = __import__(sys.argv[1])
+module.main(sys.argv[1:])
+"""
+
+def compileScript(filename, tempDir, displayName=None):
+	"""Return the compiled form of a script"""
+	compiledFilename = os.path.join(tempDir, "compiled.pyc")
+	py_compile.compile(filename, compiledFilename, displayName or filename, True)
+	return open(compiledFilename, "rb").read()
+
+def buildBundle(bundleFile, binDir):
+	"""Build the bundle (replacing any existing bundle atomically)"""
+	tempDir = tempfile.mkdtemp(prefix="yaluBuild")
+	try:
+		mainFilename = os.path.join(tempDir, "__main__.py")
+		open(mainFilename, "w").write(bundleMain)
+		
+		newBundleFile = "%s.%i"%(bundleFile, os.getpid())
+		bundle = zipfile.ZipFile(newBundleFile, "w", zipfile.ZIP_STORED)
+		bundle.writestr("__main__.pyc", compileScript(mainFilename, tempDir,
+		                                                 "<yaluPy>"))
+		for filename in sorted(os.listdir(binDir)):
+			if filename.endswith(".py"):
+				bundle.writestr(filename[:-len(".py")] + ".pyc",
+				                compileScript(os.path.join(binDir, filename),
+				                              tempDir))
+		bundle.close()
+		os.rename(newBundleFile, bundleFile)
+	finally:
+		shutil.rmtree(tempDir, True)
+
+################################################################################
+# Commandline behaviour.                                                       #
+################################################################################
+
+def main(argv):
+	if len(argv) == 2:
+		buildBundle(os.path.abspath(argv[1]),
+		            os.path.dirname(os.path.abspath(__file__)))
+	else:
+		sys.stderr.write("Usage: yaluBuild bundleFile\n")
+		sys.exit(1)
+
+if __name__ == "__main__":
+	main(sys.argv)
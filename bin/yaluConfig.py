@@ -14,7 +14,9 @@
 #   printed. If 'defaults' is supplied as an option a minimal config-file
 #   containing the defaults is printed.
 
-import sys, os, commands, re
+from __future__ import print_function
+
+import sys, os
 
 ################################################################################
 # Possible option values                                                       #
@@ -32,204 +34,235 @@ import sys, os, commands, re
 #   a label/value pair is replaced with None a seperator is inserted. If       #
 #   directories is set then a list of directories to list the files in is      #
 #   specified.                                                                 #
+#   The dictionary is only built when first used (see getYaluOptions).         #
 ################################################################################
 
-yaluOptions = {
-	"Editor" : {
-		"default": "gvim",
-		"values": [
-			("GVim", "gvim"),
-			("Emacs", "emacs"),
-			("Emacs Client", "emacsclient"),
-			None,
-			("NEdit", "nedit"),
-			("gedit", "gedit"),
-			("KATE", "kate"),
-			None,
-			("Custom", None, "Please enter your choice of graphical text editor."),
-		]
-	},
-	"Terminal" : {
-		"default": "xterm",
-		"values": [
-			("xterm", "xterm"),
-			None,
-			("Gnome Terminal", "gnome-terminal"),
-			("Konsole", "konsole"),
-			None,
-			("aterm", "aterm"),
-			("eterm", "eterm"),
-			("rxvt", "rxvt"),
-			None,
-			("Custom", None, "Please enter your choice of terminal emulator."),
-		]
-	},
-	"Browser" : {
-		"default": "firefox",
-		"values": [
-			("FireFox", "firefox"),
-			None,
-			("Konqueror", "konqueror"),
-			("Epiphany", "epiphany"),
-			None,
-			("Google Chrome", "google-chrome"),
-			("Chromium", "chromium"),
-			("Opera", "opera"),
-			None,
-			("Custom", None, "Please enter your choice of web browser."),
-		]
-	},
-	"FocusMode" : {
-		"default": "MouseFocus",
-		"values": [
-			("Click To Focus (Windows Style)", "ClickToFocus"),
-			("Focus Follows Mouse (FVWM Style)", "MouseFocus"),
-			("Sloppy Focus (X Style)", "SloppyFocus"),
-		]
-	},
-	"PlaceMode" : {
-		"default": "MinOverlapPlacement",
-		"values": [
-			("Tile if possible, then cascade", "TileCascadePlacement"),
-			("Tile if possible, then manually place", "TileManualPlacement"),
-			("Place all windows manually", "ManualPlacement"),
-			("Tile with as little overlap as possible", "MinOverlapPlacement"),
-			("Tile with as little % overlap as possible", "MinOverlapPercentPlacement"),
-		]
-	},
-	"SnapDistance" : {
-		"default": 10,
-		"values": [ ("Disabled", 0), ] + [
-			("%ipx"%(x,), x) for x in range(1, 11)
-		] + [
-			("%ipx"%(x,), x) for x in range(15, 26, 5)
-		] + [
-			("%ipx"%(x,), x) for x in range(50, 201, 50)
-		] + [
-			None,
-			("Custom", None, "How many px should the snapping distance be?")
-		]
-	},
-	"ResizeCorner" : {
-		"default": "WarpToWindow 100% 100%",
-		"values": [
-			("Cursor", ""),
-			("Top-Left", "WarpToWindow 0% 0%"),
-			("Top-Right", "WarpToWindow 100% 0%"),
-			("Bottom-Left", "WarpToWindow 0% 100%"),
-			("Bottom-Right", "WarpToWindow 100% 100%"),
-		]
-	},
-	"Desks" : {
-		"default": 0,
-		"values": [ (str(x+1), x) for x in range(5) ] + [
-			None,
-			("Custom", None, "How many desks would you like?")
-		]
-	},
-	"DeskWidth" : {
-		"default": 3,
-		"values": [ (str(x), x) for x in range(1,6) ] + [
-			None,
-			("Custom", None, "How many pages wide should each desk be?")
-		]
-	},
-	"DeskHeight" : {
-		"default": 2,
-		"values": [ (str(x), x) for x in range(1,6) ] + [
-			None,
-			("Custom", None, "How many pages high should each desk be?")
-		]
-	},
-	"EdgeJumpWidth" : {
-		"default": 100,
-		"values": [ ("Disabled", 0) ] + [
-			("%i%%"%(x,), x) for x in range(10,101, 10)
-		] + [
-			None,
-			("Custom", None, "What percentage of the screen's width should the screen jump by?")
-		]
-	},
-	"EdgeJumpHeight" : {
-		"default": 100,
-		"values": [ ("Disabled", 0) ] + [
-			("%i%%"%(x,), x) for x in range(10,101, 10)
-		] + [
-			None,
-			("Custom", None, "What percentage of the screen's height should the screen jump by?")
-		]
-	},
-	"EdgeResistDelay" : {
-		"default": 0,
-		"values": [ ("None", 0) ] + [
-			("%2.1fs"%(x/1000.0,), x) for x in range(100,1001, 100)
-		] + [
-			None,
-			("Custom", None, "How long should the delay (in ms) be before the screen changes page?")
-		]
-	},
-	"DelayExitTime" : {
-		"default": 30,
-		"values": [
-			("Do not keep", 0),
-		] + [ ("%isecs"%(x,), x) for x in range(5, 21, 5) + range(30, 60, 10)] + [
-			("1min", 60),
-			("2mins", 2*60),
-			("5mins", 5*60),
-			None,
-			("Custom", None, "How long (secs) should the terminal stay active after a program exits?")
-		]
-	},
-	"ExecHistoryType" : {
-		"default": "frequent",
-		"values": [
-			("Frequently Used", "frequent"),
-			("Recently Used", "recent"),
-		]
-	},
-	"WindowTypeColours" : {
-		"default": "",
-		"values": [
-			("Enabled", ""),
-			("Disabled", "Nop"),
-		]
-	},
-	"ImageType" : {
-		"default": "png",
-		"values": [
-			("High-Quality (PNG)", "png"),
-			("Low-Quality (XPM)", "xpm"),
-		]
-	},
-	"Theme" : {
-		"default": os.path.join(os.environ["YALU"], "themes", "default"),
-		"directories": [
-			"%s/themes/"%(os.environ["LocalYALU"],),
-			None,
-			"%s/themes/"%(os.environ["YALU"],),
-		]
-	},
-	"AutoRaise" : {
-		"default": "-1",
-		"values": [
-			("Disabled", "-1"),
-			None,
-		] + [
-			(
-				"%1.1fsecs"%(x/10.0,), str(x*100)
-			) for x in range(0, 11, 1)
-		]
-	},
-} # yaluOptions {}
+def buildYaluOptions():
+	return {
+		"Editor" : {
+			"default": "gvim",
+			"values": [
+				("GVim", "gvim"),
+				("Emacs", "emacs"),
+				("Emacs Client", "emacsclient"),
+				None,
+				("NEdit", "nedit"),
+				("gedit", "gedit"),
+				("KATE", "kate"),
+				None,
+				("Custom", None, "Please enter your choice of graphical text editor."),
+			]
+		},
+		"Terminal" : {
+			"default": "xterm",
+			"values": [
+				("xterm", "xterm"),
+				None,
+				("Gnome Terminal", "gnome-terminal"),
+				("Konsole", "konsole"),
+				None,
+				("aterm", "aterm"),
+				("eterm", "eterm"),
+				("rxvt", "rxvt"),
+				None,
+				("Custom", None, "Please enter your choice of terminal emulator."),
+			]
+		},
+		"Browser" : {
+			"default": "firefox",
+			"values": [
+				("FireFox", "firefox"),
+				None,
+				("Konqueror", "konqueror"),
+				("Epiphany", "epiphany"),
+				None,
+				("Google Chrome", "google-chrome"),
+				("Chromium", "chromium"),
+				("Opera", "opera"),
+				None,
+				("Custom", None, "Please enter your choice of web browser."),
+			]
+		},
+		"FocusMode" : {
+			"default": "MouseFocus",
+			"values": [
+				("Click To Focus (Windows Style)", "ClickToFocus"),
+				("Focus Follows Mouse (FVWM Style)", "MouseFocus"),
+				("Sloppy Focus (X Style)", "SloppyFocus"),
+			]
+		},
+		"PlaceMode" : {
+			"default": "MinOverlapPlacement",
+			"values": [
+				("Tile if possible, then cascade", "TileCascadePlacement"),
+				("Tile if possible, then manually place", "TileManualPlacement"),
+				("Place all windows manually", "ManualPlacement"),
+				("Tile with as little overlap as possible", "MinOverlapPlacement"),
+				("Tile with as little % overlap as possible", "MinOverlapPercentPlacement"),
+			]
+		},
+		"SnapDistance" : {
+			"default": 10,
+			"values": [ ("Disabled", 0), ] + [
+				("%ipx"%(x,), x) for x in range(1, 11)
+			] + [
+				("%ipx"%(x,), x) for x in range(15, 26, 5)
+			] + [
+				("%ipx"%(x,), x) for x in range(50, 201, 50)
+			] + [
+				None,
+				("Custom", None, "How many px should the snapping distance be?")
+			]
+		},
+		"ResizeCorner" : {
+			"default": "WarpToWindow 100% 100%",
+			"values": [
+				("Cursor", ""),
+				("Top-Left", "WarpToWindow 0% 0%"),
+				("Top-Right", "WarpToWindow 100% 0%"),
+				("Bottom-Left", "WarpToWindow 0% 100%"),
+				("Bottom-Right", "WarpToWindow 100% 100%"),
+			]
+		},
+		"Desks" : {
+			"default": 0,
+			"values": [ (str(x+1), x) for x in range(5) ] + [
+				None,
+				("Custom", None, "How many desks would you like?")
+			]
+		},
+		"DeskWidth" : {
+			"default": 3,
+			"values": [ (str(x), x) for x in range(1,6) ] + [
+				None,
+				("Custom", None, "How many pages wide should each desk be?")
+			]
+		},
+		"DeskHeight" : {
+			"default": 2,
+			"values": [ (str(x), x) for x in range(1,6) ] + [
+				None,
+				("Custom", None, "How many pages high should each desk be?")
+			]
+		},
+		"EdgeJumpWidth" : {
+			"default": 100,
+			"values": [ ("Disabled", 0) ] + [
+				("%i%%"%(x,), x) for x in range(10,101, 10)
+			] + [
+				None,
+				("Custom", None, "What percentage of the screen's width should the screen jump by?")
+			]
+		},
+		"EdgeJumpHeight" : {
+			"default": 100,
+			"values": [ ("Disabled", 0) ] + [
+				("%i%%"%(x,), x) for x in range(10,101, 10)
+			] + [
+				None,
+				("Custom", None, "What percentage of the screen's height should the screen jump by?")
+			]
+		},
+		"EdgeResistDelay" : {
+			"default": 0,
+			"values": [ ("None", 0) ] + [
+				("%2.1fs"%(x/1000.0,), x) for x in range(100,1001, 100)
+			] + [
+				None,
+				("Custom", None, "How long should the delay (in ms) be before the screen changes page?")
+			]
+		},
+		"DelayExitTime" : {
+			"default": 30,
+			"values": [
+				("Do not keep", 0),
+			] + [ ("%isecs"%(x,), x) for x in list(range(5, 21, 5)) + list(range(30, 60, 10))] + [
+				("1min", 60),
+				("2mins", 2*60),
+				("5mins", 5*60),
+				None,
+				("Custom", None, "How long (secs) should the terminal stay active after a program exits?")
+			]
+		},
+		"JobLogSize" : {
+			"default": 1024,
+			"values": [
+				("256KB", 256),
+				("1MB", 1024),
+				("4MB", 4 * 1024),
+				("16MB", 16 * 1024),
+				None,
+				("Custom", None, "How much of each program's output (in KB) should be kept?")
+			]
+		},
+		"JobLogCompress" : {
+			"default": "0",
+			"values": [
+				("Enabled", "1"),
+				("Disabled", "0"),
+			]
+		},
+		"ExecHistoryType" : {
+			"default": "frequent",
+			"values": [
+				("Frequently Used", "frequent"),
+				("Recently Used", "recent"),
+			]
+		},
+		"WindowTypeColours" : {
+			"default": "",
+			"values": [
+				("Enabled", ""),
+				("Disabled", "Nop"),
+			]
+		},
+		"ImageType" : {
+			"default": "png",
+			"values": [
+				("High-Quality (PNG)", "png"),
+				("Low-Quality (XPM)", "xpm"),
+			]
+		},
+		"Theme" : {
+			"default": os.path.join(os.environ["YALU"], "themes", "default"),
+			"directories": [
+				"%s/themes/"%(os.environ["LocalYALU"],),
+				None,
+				"%s/themes/"%(os.environ["YALU"],),
+			]
+		},
+		"AutoRaise" : {
+			"default": "-1",
+			"values": [
+				("Disabled", "-1"),
+				None,
+			] + [
+				(
+					"%1.1fsecs"%(x/10.0,), str(x*100)
+				) for x in range(0, 11, 1)
+			]
+		},
+	} # yaluOptions {}
+
+# The options dictionary (once built)
+yaluOptions = None
+
+def getYaluOptions():
+	global yaluOptions
+	if yaluOptions is None:
+		yaluOptions = buildYaluOptions()
+	return yaluOptions
 
 ################################################################################
 # Option file interface.                                                       #
 ################################################################################
 
 def FvwmCommand(command):
-	command = command.replace("\"","\\\"")
-	commands.getoutput("FvwmCommand \"%s\""%("Echo " + command,))
-	commands.getoutput("FvwmCommand \"%s\""%(command,))
+	# Only needed when changing options
+	import subprocess
+	
+	subprocess.call(["FvwmCommand", "Echo " + command])
+	subprocess.call(["FvwmCommand", command])
 
 class OptionDoesNotExist(Exception):
 	pass
@@ -244,19 +277,19 @@ class Option(object):
 		self.name = name
 		self.configFile = configFile
 		# Ensure the option is valid (i.e. listed in yaluOptions)
-		global yaluOptions
+		yaluOptions = getYaluOptions()
 		if name not in yaluOptions:
 			raise OptionDoesNotExist()
 		
 		self.default = str(yaluOptions[name]["default"])
 	
 	def getValues(self):
-		global yaluOptions
-		if yaluOptions[self.name].has_key("values"):
+		yaluOptions = getYaluOptions()
+		if "values" in yaluOptions[self.name]:
 			return yaluOptions[self.name]["values"]
-		elif yaluOptions[self.name].has_key("directories"):
+		elif "directories" in yaluOptions[self.name]:
 			values = []
-			print yaluOptions[self.name]["directories"]
+			print(yaluOptions[self.name]["directories"])
 			for directory in yaluOptions[self.name]["directories"]:
 				if directory != None:
 					try:
@@ -281,6 +314,9 @@ class Option(object):
 		return "SetEnv yalu%s \"%s\""%(self.name, value)
 	
 	def setValue(self, value):
+		# Only needed when changing options
+		import re
+		
 		# Load the config file (and store line-by-line)
 		config = open(self.configFile, "r").read()
 		
@@ -309,7 +345,7 @@ class Option(object):
 # Commandline behaviour.                                                       #
 ################################################################################
 
-if __name__ == "__main__":
+def main(argv):
 	# Move into the YALU dir so that all paths from now on can be relative
 	os.chdir(os.environ["LocalYALU"])
 	
@@ -322,22 +358,25 @@ if __name__ == "__main__":
 		)
 	
 	
-	if len(sys.argv) == 1:
-		print "'printAllDefaults' or..."
-		print "Available options:"
-		for option in yaluOptions:
-			print option
-	elif len(sys.argv) == 2 and sys.argv[1] == "printAllDefaults":
-		for option in yaluOptions:
+	if len(argv) == 1:
+		print("'printAllDefaults' or...")
+		print("Available options:")
+		for option in getYaluOptions():
+			print(option)
+	elif len(argv) == 2 and argv[1] == "printAllDefaults":
+		for option in getYaluOptions():
 			opt = Option(option)
-			print opt.getConfigLine(opt.default)
-	elif len(sys.argv) == 2:
-		selectedOption = Option(sys.argv[1])
-		print selectedOption.value
-		print "Default:", selectedOption.default
-	elif len(sys.argv) == 3:
-		selectedOption = Option(sys.argv[1])
-		selectedOption.value = str(sys.argv[2])
+			print(opt.getConfigLine(opt.default))
+	elif len(argv) == 2:
+		selectedOption = Option(argv[1])
+		print(selectedOption.value)
+		print("Default:", selectedOption.default)
+	elif len(argv) == 3:
+		selectedOption = Option(argv[1])
+		selectedOption.value = str(argv[2])
 	else:
 		sys.stderr.write("Invalid arguments\n")
 		sys.stderr.write("Usage: yaluConfig [optionName [newValue]]\n")
+
+if __name__ == "__main__":
+	main(sys.argv)
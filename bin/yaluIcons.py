@@ -0,0 +1,122 @@
+#!/usr/bin/python
+ ##############################################################################
+################################################################################
+####            YetAnotherLevelUp (YALU), an FVWM Configuration             ####
+####               ~ Jonathan Heathcote                                     ####
+####               ~ September 2009 - Present                               ####
+####               ~ GNU GPLv3                                              ####
+################################################################################
+ ##############################################################################
+# yaluIcons:
+#   Resolves icon names into absolute filenames so that generated menus don't
+#   make FVWM search the ImagePath for every entry. Syntax:
+#      yaluIcons iconName [iconName ...]
+#   Prints the file used for each icon.
+#
+#   The index covers the icon directories of the loaded theme (see yaluTheme)
+#   for the current yaluImageType and is only rebuilt when one of those
+#   directories changes. Icons which don't exist are replaced with the
+#   undefinedLarge icon.
+
+from __future__ import print_function
+
+import sys, os, marshal
+
+import yaluTheme
+
+# The icon used in place of icons which don't exist
+fallbackIcon = "undefinedLarge"
+
+################################################################################
+# Icon Index Object                                                            #
+################################################################################
+class IconIndex:
+	def __init__(self, directories, imageType, cacheFile="iconIndex"):
+		self.directories = directories
+		self.imageType = imageType
+		
+		mtimes = [self.__mtime(directory) for directory in directories]
+		
+		# Use the cached index if the directories haven't changed
+		try:
+			cache = marshal.loads(open(cacheFile, "rb").read())
+		except (IOError, EOFError, ValueError, TypeError):
+			cache = {}
+		
+		if cache.get("directories") == directories \
+		   and cache.get("imageType") == imageType \
+		   and cache.get("mtimes") == mtimes:
+			self.icons = cache["icons"]
+		else:
+			self.icons = self.__buildIndex()
+			yaluTheme.writeAtomically(cacheFile, marshal.dumps({
+				"directories" : directories,
+				"imageType" : imageType,
+				"mtimes" : mtimes,
+				"icons" : self.icons,
+			}))
+	
+	def __mtime(self, directory):
+		try:
+			return os.stat(directory).st_mtime
+		except OSError:
+			return None
+	
+	def __buildIndex(self):
+		"""Return a dictionary {iconName: filename} for all existing icons"""
+		icons = {}
+		extension = "." + self.imageType
+		for directory in self.directories:
+			try:
+				filenames = os.listdir(directory)
+			except OSError:
+				continue
+			for filename in filenames:
+				name, _, suffix = filename.rpartition(".")
+				# Earlier directories take priority (as in the ImagePath)
+				if "." + suffix == extension and name not in icons:
+					icons[name] = os.path.join(directory, filename)
+		return icons
+	
+	def lookup(self, name):
+		"""
+		Return the filename of an icon (or the fallback icon if it doesn't exist).
+		Returns None if neither exists.
+		"""
+		return self.icons.get(name, self.icons.get(fallbackIcon))
+
+# The index for the current theme (created when first used)
+loadedIconIndex = None
+
+def getIconIndex():
+	"""Return the IconIndex for the loaded theme and image type."""
+	global loadedIconIndex
+	if loadedIconIndex is None:
+		directories = yaluTheme.Bundle.load("themeLoaded").iconDirectories
+		if not directories:
+			# No theme has been loaded, just use the YALU icons
+			directories = [os.path.join(os.environ["YALU"], "icons")]
+		loadedIconIndex = IconIndex(directories,
+		                            os.environ.get("yaluImageType", "png"))
+	return loadedIconIndex
+
+def lookup(name):
+	"""Return the filename of the named icon (see IconIndex.lookup)"""
+	return getIconIndex().lookup(name)
+
+################################################################################
+# Commandline behaviour.                                                       #
+################################################################################
+
+def main(argv):
+	# Move into the YALU dir so that all paths from now on can be relative
+	os.chdir(os.environ["LocalYALU"])
+	
+	if len(argv) >= 2:
+		for name in argv[1:]:
+			print(lookup(name))
+	else:
+		sys.stderr.write("Usage: yaluIcons iconName [iconName ...]\n")
+
+if __name__ == "__main__":
+	main(sys.argv)
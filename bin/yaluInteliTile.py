@@ -26,23 +26,100 @@
 #   To maximise a window into a free space but keeping existing height
 #       yaluInteliTile widePlace [yaluInteliTileID] [x] [y] [width] [height]
 #
+#   On multi-head setups the free space is only searched for on the monitor
+#   containing (most of) the window being placed, using only the windows on that
+#   monitor. The monitor layout is read from xrandr when the screen size changes
+#   and is cached in LocalYALU. To re-read it (e.g. on start up) run:
+#       yaluInteliTile monitors [screenWidth] [screenHeight]
+#
 #   The space-finding algorithm used in this script was originally devised by
 #   Tom Nixon and the implementation shown is loosely based on his refrence
 #   implementation.
 
-import sys, os, tempfile
+from __future__ import print_function
+
+import sys, os
+
+# The file the monitor layout is cached in (relative to LocalYALU)
+monitorCacheFile = "monitors"
+
+################################################################################
+# Monitor layout                                                               #
+################################################################################
+def queryMonitors(screenWidth, screenHeight):
+	"""
+	Return a list of (x, y, width, height) strings for each monitor according to
+	xrandr (or the whole screen if xrandr isn't available).
+	"""
+	import subprocess, re
+	
+	try:
+		output = subprocess.Popen(["xrandr", "--listmonitors"],
+		                          stdout=subprocess.PIPE).communicate()[0]
+	except OSError:
+		output = b""
+	
+	# e.g. " 0: +*DP-1 1920/530x1080/300+0+0  DP-1"
+	monitors = []
+	for match in re.finditer(r"(\d+)/\d+x(\d+)/\d+\+(-?\d+)\+(-?\d+)",
+	                         output.decode("utf-8", "replace")):
+		width, height, x, y = match.groups()
+		monitors.append((x, y, width, height))
+	
+	return monitors or [("0", "0", screenWidth, screenHeight)]
+
+def refreshMonitors(screenWidth, screenHeight):
+	"""Re-read the monitor layout into the cache and return it"""
+	import yaluTheme
+	
+	monitors = queryMonitors(screenWidth, screenHeight)
+	yaluTheme.writeAtomically(monitorCacheFile, "".join(
+		["%s %s\n"%(screenWidth, screenHeight)] +
+		["%s %s %s %s\n"%monitor for monitor in monitors]))
+	return monitors
+
+def getMonitors(screenWidth, screenHeight):
+	"""
+	Return the cached monitor layout, re-reading it if the screen size has
+	changed since it was cached.
+	"""
+	try:
+		rawData = open(monitorCacheFile, "r").read().strip().split("\n")
+	except IOError:
+		rawData = []
+	
+	if rawData and rawData[0].split(" ") == [screenWidth, screenHeight]:
+		return [tuple(line.split(" ")) for line in rawData[1:]]
+	else:
+		return refreshMonitors(screenWidth, screenHeight)
 
 ################################################################################
 # Secure a tempoary file in memory                                             #
 ################################################################################
 def setInitialInteliTileID(screenWidth, screenHeight):
-	# Get a tempoary file 
-	fileObj, filename = tempfile.mkstemp(prefix="yaluInteliTile",dir="/dev/shm")
+	# Get a tempoary file (which only we can read). The tempfile module isn't
+	# used as it takes longer to import than the rest of this script to run.
+	attempt = 0
+	while True:
+		filename = "/dev/shm/yaluInteliTile%i_%i"%(os.getpid(), attempt)
+		try:
+			fileNo = os.open(filename, os.O_WRONLY | os.O_CREAT | os.O_EXCL,
+			                 0o600)
+			break
+		except OSError:
+			if not os.path.exists(filename):
+				raise
+			attempt += 1
 	
-	# Add the width/height of the screen as the initial data
-	open(filename, "w").write("%s %s\n"%(screenWidth, screenHeight))
+	# Add the width/height of the screen and the monitors as the initial data
+	os.write(fileNo, "".join(
+		["%s %s\n"%(screenWidth, screenHeight)] +
+		["monitor %s %s %s %s\n"%monitor
+		 for monitor in getMonitors(screenWidth, screenHeight)]
+	).encode("ascii"))
+	os.close(fileNo)
 	
-	print "SetEnv yaluInteliTileID \"%s\""%(filename)
+	print("SetEnv yaluInteliTileID \"%s\""%(filename))
 
 ################################################################################
 # Store a window's information in the tempoary file                            #
@@ -144,7 +221,7 @@ def partitionSpace(space, window):
 	partitionedSpace.append(Rectangle(Point(space.left, window.btm),
 	                                space.btmRight))
 	
-	return filter(Rectangle.isValid, partitionedSpace)
+	return [space for space in partitionedSpace if space.isValid()]
 
 def findSpaces(screen, windows):
 	### Find spaces on screen ###
@@ -181,17 +258,50 @@ def loadScreenAndWindows(tempFile):
 	screen = Rectangle(Point(0,0),
 	                   Point(*[int(x) for x in rawData[0].split(" ")[:2]]))
 	
-	# For each line, extract the window x,y,width,height (split by spaces) and
-	# represent as a rectangle
-	windows = [ Rectangle(Point(int(x), int(y)),
-	                      Point(int(x)+int(w), int(y)+int(h)))
-		for x,y,w,h in [line.split(" ") for line in rawData[1:]]
-	]
+	# For each line, extract the monitor or window x,y,width,height (split by
+	# spaces) and represent as a rectangle
+	monitors = []
+	windows = []
+	for line in rawData[1:]:
+		fields = line.split(" ")
+		if fields[0] == "monitor":
+			rectangles = monitors
+			fields = fields[1:]
+		else:
+			rectangles = windows
+		x, y, w, h = [int(field) for field in fields]
+		rectangles.append(Rectangle(Point(x, y), Point(x+w, y+h)))
 	
 	# Delete the file afterwards
 	os.remove(tempFile)
 	
-	return screen, windows
+	return screen, monitors or [screen], windows
+
+def overlap(a, b):
+	"""The area of the overlap between two rectangles"""
+	return (max(0, min(a.right, b.right) - max(a.left, b.left)) *
+	        max(0, min(a.btm, b.btm) - max(a.top, b.top)))
+
+def findTargetSpaces(tempFile, targetWindow, fits=(lambda rect : True)):
+	"""
+	Find the spaces (which the fits function accepts) on the monitor containing
+	most of the target window. Only the windows on that monitor are used to
+	partition it. If none of its spaces fit (e.g. the window is wider than the
+	monitor) the whole screen is used instead.
+	"""
+	screen, monitors, windows = loadScreenAndWindows(tempFile)
+	
+	monitor = max(monitors, key=(lambda monitor :
+	                             overlap(monitor, targetWindow)))
+	
+	emptySpaces = [rect for rect in
+	               findSpaces(monitor, [window for window in windows
+	                                    if window in monitor])
+	               if fits(rect)]
+	if not emptySpaces and monitor is not screen:
+		emptySpaces = [rect for rect in findSpaces(screen, windows)
+		               if fits(rect)]
+	return emptySpaces
 
 def loadTarget(targetX, targetY, targetWidth, targetHeight):
 	return Rectangle(Point(int(targetX), int(targetY)),
@@ -199,52 +309,49 @@ def loadTarget(targetX, targetY, targetWidth, targetHeight):
 	                       int(targetY) + int(targetHeight)))
 
 def setWindowSizeAndPosition(width, height, x, y):
-	print "Maximize %ip %ip"%(width, height)
-	print "ThisWindow (Maximized) Move %ip %ip"%(x, y)
+	print("Maximize %ip %ip"%(width, height))
+	print("ThisWindow (Maximized) Move %ip %ip"%(x, y))
 
 def placeWindow(tempFile, *targetWindow):
-	emptySpaces = findSpaces(*loadScreenAndWindows(tempFile))
 	targetWindow = loadTarget(*targetWindow)
+	emptySpaces = findTargetSpaces(tempFile, targetWindow)
 	
-	largestSpace = max(emptySpaces, key=(lambda rect : rect.area))
-	
-	if largestSpace:
+	if emptySpaces:
+		largestSpace = max(emptySpaces, key=(lambda rect : rect.area))
 		setWindowSizeAndPosition(largestSpace.width, largestSpace.height,
 		                         largestSpace.left, largestSpace.top)
 
 def tallPlaceWindow(tempFile, *targetWindow):
-	emptySpaces = findSpaces(*loadScreenAndWindows(tempFile))
 	targetWindow = loadTarget(*targetWindow)
 	
-	# Remove any spaces that are too narrow
-	emptySpaces = filter((lambda rect: rect.width >= targetWindow.width),
-	                     emptySpaces)
+	# Ignore any spaces that are too narrow
+	emptySpaces = findTargetSpaces(
+		tempFile, targetWindow,
+		lambda rect : rect.width >= targetWindow.width)
 	
 	# Sort spaces from left-to-right (so that if there are any equally sized
 	# maximum spaces then the left-most one will be chosen).
 	emptySpaces = sorted(emptySpaces, key=(lambda rect : rect.left))
 	
-	largestSpace = max(emptySpaces, key=(lambda rect : rect.height))
-	
-	if largestSpace:
+	if emptySpaces:
+		largestSpace = max(emptySpaces, key=(lambda rect : rect.height))
 		setWindowSizeAndPosition(targetWindow.width, largestSpace.height,
 		                         largestSpace.left, largestSpace.top)
 
 def widePlaceWindow(tempFile, *targetWindow):
-	emptySpaces = findSpaces(*loadScreenAndWindows(tempFile))
 	targetWindow = loadTarget(*targetWindow)
 	
-	# Remove any spaces that are too narrow
-	emptySpaces = filter((lambda rect: rect.height >= targetWindow.height),
-	                     emptySpaces)
+	# Ignore any spaces that are too short
+	emptySpaces = findTargetSpaces(
+		tempFile, targetWindow,
+		lambda rect : rect.height >= targetWindow.height)
 	
 	# Sort spaces from top-to-bottom (so that if there are any equally sized
 	# maximum spaces then the left-most one will be chosen).
 	emptySpaces = sorted(emptySpaces, key=(lambda rect : rect.top))
 	
-	largestSpace = max(emptySpaces, key=(lambda rect : rect.width))
-	
-	if largestSpace:
+	if emptySpaces:
+		largestSpace = max(emptySpaces, key=(lambda rect : rect.width))
 		setWindowSizeAndPosition(largestSpace.width, targetWindow.height,
 		                         largestSpace.left, largestSpace.top)
 
@@ -253,21 +360,26 @@ def widePlaceWindow(tempFile, *targetWindow):
 # Commandline behaviour.                                                       #
 ################################################################################
 
-if __name__ == "__main__":
+def main(argv):
 	# Move into the YALU dir so that all paths from now on can be relative
 	os.chdir(os.environ["LocalYALU"])
 	
-	if len(sys.argv) >= 2:
-		if sys.argv[1] == "init" and len(sys.argv) == 4:
-			setInitialInteliTileID(*sys.argv[2:])
-		elif sys.argv[1] == "add" and len(sys.argv) == 7:
-			storeWindowInfo(*sys.argv[2:])
-		elif sys.argv[1] == "place" and len(sys.argv) == 7:
-			placeWindow(*sys.argv[2:])
-		elif sys.argv[1] == "tallPlace" and len(sys.argv) == 7:
-			tallPlaceWindow(*sys.argv[2:])
-		elif sys.argv[1] == "widePlace" and len(sys.argv) == 7:
-			widePlaceWindow(*sys.argv[2:])
+	if len(argv) >= 2:
+		if argv[1] == "init" and len(argv) == 4:
+			setInitialInteliTileID(*argv[2:])
+		elif argv[1] == "monitors" and len(argv) == 4:
+			refreshMonitors(*argv[2:])
+		elif argv[1] == "add" and len(argv) == 7:
+			storeWindowInfo(*argv[2:])
+		elif argv[1] == "place" and len(argv) == 7:
+			placeWindow(*argv[2:])
+		elif argv[1] == "tallPlace" and len(argv) == 7:
+			tallPlaceWindow(*argv[2:])
+		elif argv[1] == "widePlace" and len(argv) == 7:
+			widePlaceWindow(*argv[2:])
 		else:
 			sys.stderr.write("Wrong number of arguments\n")
 
+if __name__ == "__main__":
+	main(sys.argv)
+
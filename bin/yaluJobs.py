@@ -0,0 +1,800 @@
+#!/usr/bin/python
+ ##############################################################################
+################################################################################
+####            YetAnotherLevelUp (YALU), an FVWM Configuration             ####
+####               ~ Jonathan Heathcote                                     ####
+####               ~ September 2009 - Present                               ####
+####               ~ GNU GPLv3                                              ####
+################################################################################
+ ##############################################################################
+# yaluJobs:
+#   Runs programs launched by YaluExec under a single supervisor process which
+#   captures their output (stdout and stderr) and exit status. Syntax:
+#      yaluJobs run command [command's options]
+#         Start a command (in the current directory and environment).
+#      yaluJobs list
+#         Print the status and resource usage of each job (as in the stats
+#         file, see below).
+#      yaluJobs view jobId
+#         Show a job's output as it is produced (run in a terminal). Once the
+#         job exits the viewer stays open for yaluDelayExitTime seconds and
+#         allows the job to be re-run or a shell to be opened in its directory.
+#      yaluJobs rerun jobId
+#      yaluJobs kill jobId [signal]
+#         Send a signal (default: TERM) to every process started by a job.
+#      yaluJobs supervise
+#         Run the supervisor (it is started automatically by run when needed).
+#
+#   The supervisor listens on a unix socket in LocalYALU and keeps each job for
+#   yaluDelayExitTime seconds after it exits. It exits by itself once there have
+#   been no jobs for a while. Python 2 and 3 can't read each other's requests
+#   so each version of Python has its own supervisor (and files, which are
+#   named with a -py2 or -py3 suffix).
+#
+#   The supervisor is a single-threaded select() loop over the socket and the
+#   jobs' output pipes rather than an asyncio event loop. This is deliberate:
+#   asyncio isn't available in Python 2 which YALU still supports, and a plain
+#   select() loop is all the supervisor needs for a handful of jobs.
+#
+#   The memory (RSS), CPU time and number of processes of each running job's
+#   process tree are sampled from /proc every few seconds. They are shown by
+#   list and written to LocalYALU/jobStats-pyN (one tab-separated line per job,
+#   described by the first line) for use by other programs.
+#
+#   Each job's output is written to a ring-buffered log in
+#   LocalYALU/jobLogs-pyN which holds at most the last yaluJobLogSize KB of
+#   output. If yaluJobLogCompress is 1 the log is gzipped once the job finishes.
+#   The logs of the last few jobs are kept after they are forgotten and can
+#   still be viewed.
+
+from __future__ import print_function
+
+import sys, os, time, socket, select, signal, marshal, errno, subprocess
+import mmap, struct
+
+import yaluTheme
+
+# Files used by the supervisor (relative to LocalYALU)
+pythonSuffix = "-py%i"%(sys.version_info[0],)
+socketFile = "jobs%s.socket"%(pythonSuffix,)
+lockFile = "jobs%s.lock"%(pythonSuffix,)
+logDirectory = "jobLogs%s"%(pythonSuffix,)
+statsFile = "jobStats%s"%(pythonSuffix,)
+
+# Seconds between checking on jobs which have no new output
+pollInterval = 0.5
+
+# Seconds between samples of each job's resource usage
+statsInterval = 2
+
+# Seconds the supervisor waits without any jobs before exiting
+idleTimeout = 60
+
+# The number of logs kept (including those of forgotten jobs)
+keptLogs = 20
+
+def envInt(env, name, default):
+	"""Read an integer setting from a job's environment"""
+	try:
+		return int(env.get(name) or default)
+	except ValueError:
+		return default
+
+def startSession():
+	"""
+	Run in each job's process before the command is executed: puts it in its own
+	session and restores the signals Python ignores (Python 2's subprocess
+	doesn't restore them).
+	"""
+	for signalName in ("SIGPIPE", "SIGXFSZ"):
+		if hasattr(signal, signalName):
+			signal.signal(getattr(signal, signalName), signal.SIG_DFL)
+	os.setsid()
+
+def quoteCommand(command):
+	"""Format a command (a list of arguments) as it could be typed in a shell"""
+	quoted = []
+	for argument in command:
+		if argument == "" or any(not (char.isalnum() or char in "-_./=:,+@%")
+		                         for char in argument):
+			argument = "'%s'"%(argument.replace("'", "'\\''"),)
+		quoted.append(argument)
+	return " ".join(quoted)
+
+################################################################################
+# Ring-buffered logs                                                           #
+#   A log file is a header (magic, capacity, number of bytes ever written)     #
+#   followed by capacity bytes of output. Once full, the oldest output is      #
+#   overwritten. Logs are memory-mapped so neither writing nor reading them    #
+#   ever copies the whole log into memory.                                     #
+################################################################################
+logHeader = struct.Struct("<8sQQ")
+logMagic = b"YALULOG1"
+
+class RingLog:
+	"""Writes output to a new ring-buffered log"""
+	def __init__(self, filename, capacity):
+		self.capacity = max(capacity, 4096)
+		self.written = 0
+		
+		# Created under a temporary name so that viewers of a previous log with
+		# the same name (which may have it mapped) aren't disturbed
+		newFilename = filename + ".new"
+		self.file = open(newFilename, "w+b")
+		self.file.truncate(logHeader.size + self.capacity)
+		self.map = mmap.mmap(self.file.fileno(), logHeader.size + self.capacity)
+		self.__writeHeader()
+		os.rename(newFilename, filename)
+	
+	def __writeHeader(self):
+		self.map[:logHeader.size] = logHeader.pack(logMagic, self.capacity,
+		                                           self.written)
+	
+	def write(self, data):
+		# Only the end of data will fit
+		if len(data) > self.capacity:
+			self.written += len(data) - self.capacity
+			data = data[-self.capacity:]
+		
+		offset = self.written % self.capacity
+		firstPart = min(len(data), self.capacity - offset)
+		start = logHeader.size + offset
+		self.map[start:start + firstPart] = data[:firstPart]
+		
+		# Wrap around to the start
+		rest = len(data) - firstPart
+		self.map[logHeader.size:logHeader.size + rest] = data[firstPart:]
+		
+		self.written += len(data)
+		self.__writeHeader()
+	
+	def close(self):
+		self.map.close()
+		self.file.close()
+
+class RingLogReader:
+	"""Reads a ring-buffered log (which may still be being written)"""
+	def __init__(self, filename):
+		self.file = open(filename, "rb")
+		self.map = mmap.mmap(self.file.fileno(),
+		                     os.fstat(self.file.fileno()).st_size,
+		                     access=mmap.ACCESS_READ)
+		magic, self.capacity, _ = self.__readHeader()
+		if magic != logMagic:
+			raise IOError("%s is not a yaluJobs log"%(filename,))
+		self.position = 0
+	
+	def __readHeader(self):
+		return logHeader.unpack(self.map[:logHeader.size])
+	
+	def read(self, size=65536):
+		"""Return (up to size bytes of) the output written since the last read"""
+		written = self.__readHeader()[2]
+		
+		notice = b""
+		if written - self.position > self.capacity:
+			# The output has been overwritten since it was last read
+			notice = ("[... %i bytes dropped ...]\n"%(
+				written - self.capacity - self.position,)).encode("ascii")
+			self.position = written - self.capacity
+		
+		offset = self.position % self.capacity
+		length = min(size, written - self.position, self.capacity - offset)
+		start = logHeader.size + offset
+		self.position += length
+		return notice + self.map[start:start + length]
+	
+	def close(self):
+		self.map.close()
+		self.file.close()
+
+def openLog(filename):
+	"""Open a (possibly compressed) log, returns an object with read(size)"""
+	if filename.endswith(".gz"):
+		import gzip
+		return gzip.open(filename, "rb")
+	else:
+		return RingLogReader(filename)
+
+def compressLog(filename):
+	"""Gzip a ring-buffered log, returns the new filename"""
+	import gzip
+	
+	compressedFilename = filename + ".gz"
+	log = RingLogReader(filename)
+	compressed = gzip.open(compressedFilename + ".new", "wb")
+	while True:
+		data = log.read()
+		if not data:
+			break
+		compressed.write(data)
+	compressed.close()
+	log.close()
+	os.rename(compressedFilename + ".new", compressedFilename)
+	os.remove(filename)
+	return compressedFilename
+
+def logJobId(filename):
+	"""The id of the job a log belongs to (or None if it isn't a log)"""
+	name = filename.split(".")[0]
+	if name.isdigit() and filename in ("%s.log"%(name,), "%s.log.gz"%(name,)):
+		return int(name)
+	return None
+
+def pruneLogs(keep, liveJobIds):
+	"""Remove all but the newest keep logs (and the logs of live jobs)"""
+	logs = []
+	for filename in os.listdir(logDirectory):
+		if logJobId(filename) is not None:
+			logs.append((logJobId(filename), filename))
+	logs.sort()
+	for jobId, filename in logs[:max(0, len(logs) - keep)]:
+		if jobId not in liveJobIds:
+			os.remove(os.path.join(logDirectory, filename))
+
+################################################################################
+# Process accounting                                                           #
+################################################################################
+clockTicks = os.sysconf("SC_CLK_TCK")
+pageSize = os.sysconf("SC_PAGE_SIZE")
+
+def readProcesses():
+	"""
+	Return a dictionary {pid: (parentPid, cpuTicks, rssPages)} for every
+	process (cpuTicks includes the time of any children it has waited for).
+	"""
+	processes = {}
+	for name in os.listdir("/proc"):
+		if not name.isdigit():
+			continue
+		try:
+			stat = open("/proc/%s/stat"%(name,), "r").read()
+		except IOError:
+			# The process has already exited
+			continue
+		
+		# The fields following the (bracketed) program name
+		fields = stat[stat.rfind(")") + 2:].split()
+		processes[int(name)] = (int(fields[1]),
+		                        sum(map(int, fields[11:15])),
+		                        int(fields[21]))
+	return processes
+
+def processTrees(processes, roots):
+	"""Return a dictionary {root: [pids of root and its descendants]}"""
+	children = {}
+	for pid, (parentPid, _, _) in processes.items():
+		children.setdefault(parentPid, []).append(pid)
+	
+	trees = {}
+	for root in roots:
+		if root in processes:
+			tree = [root]
+			for pid in tree:
+				tree.extend(children.get(pid, []))
+			trees[root] = tree
+	return trees
+
+################################################################################
+# Supervisor                                                                   #
+################################################################################
+class Job:
+	def __init__(self, jobId, command, cwd, env):
+		self.jobId = jobId
+		self.command = command
+		self.cwd = cwd
+		self.env = env
+		
+		# How long to keep the job after it exits
+		self.delayExitTime = envInt(env, "yaluDelayExitTime", 0)
+		
+		# The size of the output log (KB) and whether to compress it afterwards
+		self.logSize = envInt(env, "yaluJobLogSize", 1024) * 1024
+		self.compressLog = envInt(env, "yaluJobLogCompress", 0) == 1
+		
+		self.start()
+	
+	def start(self):
+		"""(Re)start the job, discarding any previous output"""
+		self.started = time.time()
+		self.finished = None
+		self.exitStatus = None
+		
+		# Replace any previous log
+		self.logFile = os.path.join(logDirectory, "%i.log"%(self.jobId,))
+		if os.path.exists(self.logFile + ".gz"):
+			os.remove(self.logFile + ".gz")
+		self.log = RingLog(self.logFile, self.logSize)
+		
+		# Resource usage of the job's process tree (see sample)
+		self.pids = []
+		self.rss = 0
+		self.cpuTime = 0.0
+		self.cpuPercent = 0.0
+		self.sampled = None
+		
+		try:
+			self.process = subprocess.Popen(self.command,
+			                                cwd=self.cwd, env=self.env,
+			                                stdin=open(os.devnull, "rb"),
+			                                stdout=subprocess.PIPE,
+			                                stderr=subprocess.STDOUT,
+			                                close_fds=True,
+			                                preexec_fn=startSession)
+			self.output = self.process.stdout
+		except OSError as e:
+			# The command couldn't be run (e.g. it doesn't exist)
+			message = "%s: %s\n"%(self.command[0], e.strerror)
+			self.log.write(message.encode("utf-8"))
+			self.log.close()
+			self.process = None
+			self.output = None
+			self.finished = self.started
+			self.exitStatus = 127
+	
+	def readOutput(self):
+		"""Copy any output waiting to be read into the log"""
+		data = os.read(self.output.fileno(), 65536)
+		if data:
+			self.log.write(data)
+		else:
+			# The program closed its output
+			self.output.close()
+			self.output = None
+			self.log.close()
+	
+	def poll(self, now):
+		"""Check whether the job has exited"""
+		if self.finished is None and self.process.poll() is not None:
+			self.finished = now
+			self.exitStatus = self.process.returncode
+		
+		if self.compressLog and self.finished is not None \
+		   and self.output is None and not self.logFile.endswith(".gz"):
+			self.logFile = compressLog(self.logFile)
+	
+	def expired(self, now):
+		"""Has the job finished and been kept for long enough?"""
+		return self.finished is not None \
+		       and self.output is None \
+		       and now >= self.finished + self.delayExitTime
+	
+	def sample(self, processes, trees, now):
+		"""Update the job's resource usage from a sample of /proc"""
+		if self.finished is not None or self.process.pid not in trees:
+			return
+		self.pids = trees[self.process.pid]
+		
+		cpuTime = sum(processes[pid][1] for pid in self.pids) / float(clockTicks)
+		if self.sampled is not None and now > self.sampled:
+			self.cpuPercent = 100 * (cpuTime - self.cpuTime) / (now - self.sampled)
+		self.cpuTime = cpuTime
+		self.rss = sum(processes[pid][2] for pid in self.pids) * pageSize
+		self.sampled = now
+	
+	def kill(self, signalNumber=signal.SIGTERM):
+		"""Signal the job's process group and everything in its process tree"""
+		if self.finished is None:
+			for kill, pid in [(os.killpg, self.process.pid)] \
+			                 + [(os.kill, pid) for pid in self.pids]:
+				try:
+					kill(pid, signalNumber)
+				except OSError:
+					pass
+	
+	def forget(self):
+		"""Close the job's output (its log is kept)"""
+		if self.output is not None:
+			self.output.close()
+			self.log.close()
+	
+	def summary(self):
+		"""Return a dictionary describing the job (as sent to clients)"""
+		return {
+			"jobId" : self.jobId,
+			"command" : self.command,
+			"cwd" : self.cwd,
+			"pid" : self.process and self.process.pid,
+			"started" : self.started,
+			"finished" : self.finished,
+			"exitStatus" : self.exitStatus,
+			"outputClosed" : self.output is None,
+			"delayExitTime" : self.delayExitTime,
+			"rss" : self.rss,
+			"cpuTime" : self.cpuTime,
+			"cpuPercent" : self.cpuPercent,
+			"processes" : len(self.pids),
+			"logFile" : os.path.abspath(self.logFile),
+		}
+
+class Supervisor:
+	def __init__(self):
+		self.jobs = {}
+		
+		# Carry on from the jobs whose logs were kept
+		self.nextJobId = 1 + max([logJobId(filename) or 0
+		                          for filename in os.listdir(logDirectory)] + [0])
+	
+	def run(self, command, cwd, env):
+		jobId = self.nextJobId
+		self.nextJobId += 1
+		self.jobs[jobId] = Job(jobId, command, cwd, env)
+		return jobId
+	
+	def rerun(self, jobId):
+		job = self.jobs.get(jobId)
+		if job is None or job.finished is None:
+			return False
+		if job.output is not None:
+			job.output.close()
+			job.log.close()
+		job.start()
+		return True
+	
+	def kill(self, jobId, signalNumber=signal.SIGTERM):
+		if jobId not in self.jobs:
+			return False
+		self.jobs[jobId].kill(signalNumber)
+		return True
+	
+	def info(self, jobId):
+		job = self.jobs.get(jobId)
+		return job and job.summary()
+	
+	def list(self):
+		return [self.jobs[jobId].summary() for jobId in sorted(self.jobs)]
+	
+	def sample(self, now):
+		"""Sample the resource usage of the running jobs"""
+		running = [job for job in self.jobs.values() if job.finished is None]
+		if running:
+			processes = readProcesses()
+			trees = processTrees(processes,
+			                     [job.process.pid for job in running])
+			for job in running:
+				job.sample(processes, trees, now)
+	
+	def writeStats(self, lastStats):
+		"""Write the stats file if it has changed, returns its contents"""
+		stats = statsHeader + "".join(statsLine(job) + "\n"
+		                              for job in self.list())
+		if stats != lastStats:
+			yaluTheme.writeAtomically(statsFile, stats)
+		return stats
+	
+	def handleRequest(self, request):
+		"""Requests are tuples (verb, arguments...)"""
+		verbs = {
+			"run" : self.run,
+			"rerun" : self.rerun,
+			"kill" : self.kill,
+			"info" : self.info,
+			"list" : self.list,
+		}
+		return verbs[request[0]](*request[1:])
+	
+	def handleConnection(self, connection):
+		connection.settimeout(2)
+		try:
+			try:
+				request = marshal.loads(receiveAll(connection))
+				connection.sendall(marshal.dumps(self.handleRequest(request)))
+			except (socket.error, EOFError, ValueError, TypeError, KeyError):
+				pass
+		finally:
+			connection.close()
+	
+	def supervise(self, listener):
+		idleSince = time.time()
+		lastSampled = 0
+		stats = None
+		while True:
+			now = time.time()
+			for jobId, job in list(self.jobs.items()):
+				job.poll(now)
+				if job.expired(now):
+					job.forget()
+					del self.jobs[jobId]
+					pruneLogs(keptLogs, self.jobs)
+			
+			if now - lastSampled >= statsInterval:
+				self.sample(now)
+				stats = self.writeStats(stats)
+				lastSampled = now
+			
+			if self.jobs:
+				idleSince = now
+			elif now - idleSince > idleTimeout:
+				break
+			
+			outputs = dict((job.output.fileno(), job)
+			               for job in self.jobs.values()
+			               if job.output is not None)
+			try:
+				readable = select.select([listener] + list(outputs), [], [],
+				                         pollInterval)[0]
+			except select.error as e:
+				if e.args[0] == errno.EINTR:
+					continue
+				raise
+			
+			for fileno in readable:
+				if fileno in outputs:
+					outputs[fileno].readOutput()
+			if listener in readable:
+				try:
+					connection = listener.accept()[0]
+				except socket.error:
+					continue
+				self.handleConnection(connection)
+
+def supervise():
+	"""Run the supervisor (unless one is already running)"""
+	import fcntl
+	
+	lock = open(lockFile, "a")
+	try:
+		fcntl.flock(lock.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+	except IOError:
+		# Another supervisor is running
+		return
+	
+	if not os.path.isdir(logDirectory):
+		os.mkdir(logDirectory)
+	
+	if os.path.exists(socketFile):
+		os.remove(socketFile)
+	listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+	listener.bind(socketFile)
+	listener.listen(16)
+	try:
+		Supervisor().supervise(listener)
+	finally:
+		os.remove(socketFile)
+		listener.close()
+
+################################################################################
+# Client                                                                       #
+################################################################################
+class SupervisorDidNotStart(Exception):
+	pass
+
+def receiveAll(connection):
+	data = []
+	while True:
+		chunk = connection.recv(65536)
+		if not chunk:
+			return b"".join(data)
+		data.append(chunk)
+
+def startSupervisor():
+	"""Start a supervisor in the background"""
+	devnull = open(os.devnull, "r+b")
+	subprocess.Popen([sys.executable,
+	                  os.path.join(os.environ["YALU"], "bin", "yaluJobs.py"),
+	                  "supervise"],
+	                 cwd=os.environ["LocalYALU"],
+	                 stdin=devnull, stdout=devnull, stderr=devnull,
+	                 close_fds=True, preexec_fn=os.setsid)
+
+def request(message, startIfNeeded=False):
+	"""
+	Send a request to the supervisor and return its reply. Returns None if the
+	supervisor isn't running (and startIfNeeded isn't set).
+	"""
+	filename = os.path.join(os.environ["LocalYALU"], socketFile)
+	connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+	try:
+		connection.connect(filename)
+	except socket.error:
+		if not startIfNeeded:
+			return None
+		startSupervisor()
+		# Wait for it to start listening
+		for _ in range(100):
+			time.sleep(0.02)
+			try:
+				connection.connect(filename)
+				break
+			except socket.error:
+				pass
+		else:
+			raise SupervisorDidNotStart()
+	
+	try:
+		connection.sendall(marshal.dumps(message))
+		connection.shutdown(socket.SHUT_WR)
+		return marshal.loads(receiveAll(connection))
+	finally:
+		connection.close()
+
+def runJob(command, cwd=None, env=None):
+	"""Start a job, returns its id"""
+	return request(("run", command, cwd or os.getcwd(), env or dict(os.environ)),
+	               True)
+
+def listJobs():
+	"""Return a list of dictionaries describing each job (see Job.summary)"""
+	return request(("list",)) or []
+
+def jobInfo(jobId):
+	"""Return a dictionary describing a job or None if it doesn't exist"""
+	return request(("info", jobId))
+
+def rerunJob(jobId):
+	return request(("rerun", jobId))
+
+def killJob(jobId, signalNumber=signal.SIGTERM):
+	return request(("kill", jobId, signalNumber))
+
+def jobStatus(job):
+	"""Describe the state of a job (as returned by listJobs)"""
+	if job["finished"] is None:
+		return "running"
+	elif job["exitStatus"] < 0:
+		return "killed by signal %i"%(-job["exitStatus"],)
+	else:
+		return "exit status %i"%(job["exitStatus"],)
+
+def formatSize(size):
+	"""Format a number of bytes for people"""
+	for unit in ["B", "KB", "MB"]:
+		if size < 1024:
+			return "%i%s"%(size, unit)
+		size /= 1024.0
+	return "%.1fGB"%(size,)
+
+def formatUsage(job):
+	"""Describe the resources used by a job (as returned by listJobs)"""
+	usage = "%s, %.0f%% CPU"%(formatSize(job["rss"]), job["cpuPercent"])
+	if job["processes"] > 1:
+		usage += ", %i processes"%(job["processes"],)
+	return usage
+
+# The first line of the stats file (and list's output) describing each column
+statsHeader = "#jobId\tpid\tstatus\trssKB\tcpuSeconds\tcpuPercent" \
+              "\tprocesses\tcommand\n"
+
+def statsLine(job):
+	"""A line of the stats file describing a job (as returned by listJobs)"""
+	return "%i\t%s\t%s\t%i\t%.2f\t%.1f\t%i\t%s"%(
+		job["jobId"],
+		job["pid"],
+		jobStatus(job),
+		job["rss"] // 1024,
+		job["cpuTime"],
+		job["cpuPercent"],
+		job["processes"],
+		quoteCommand(job["command"]),
+	)
+
+################################################################################
+# Output viewer                                                                #
+################################################################################
+def readKey(timeout):
+	"""Wait up to timeout seconds for a key press, returns None on timeout"""
+	import termios, tty
+	
+	stdin = sys.stdin.fileno()
+	oldSettings = termios.tcgetattr(stdin)
+	try:
+		tty.setcbreak(stdin)
+		if select.select([stdin], [], [], timeout)[0]:
+			return os.read(stdin, 1).decode("utf-8", "replace")
+		return None
+	finally:
+		termios.tcsetattr(stdin, termios.TCSADRAIN, oldSettings)
+
+def writeOutput(data):
+	"""Write (bytes of) a log to stdout"""
+	sys.stdout.flush()
+	getattr(sys.stdout, "buffer", sys.stdout).write(data)
+
+def viewLog(jobId):
+	"""Show the kept log of a job which the supervisor has forgotten"""
+	for filename in ("%i.log"%(jobId,), "%i.log.gz"%(jobId,)):
+		filename = os.path.join(os.environ["LocalYALU"], logDirectory, filename)
+		if os.path.exists(filename):
+			log = openLog(filename)
+			data = log.read(65536)
+			while data:
+				writeOutput(data)
+				data = log.read(65536)
+			log.close()
+			return 0
+	print("No such job: %i"%(jobId,))
+	return 1
+
+def viewJob(jobId):
+	"""Show a job's output until it exits then offer to re-run it"""
+	separator = "*" * 40
+	while True:
+		job = jobInfo(jobId)
+		if job is None:
+			return viewLog(jobId)
+		
+		try:
+			log = openLog(job["logFile"])
+		except (IOError, OSError):
+			# The log was compressed as it was opened
+			continue
+		
+		print("Command: %s"%(quoteCommand(job["command"]),))
+		print("Started: %s"%(time.ctime(job["started"]),))
+		print(separator)
+		
+		# Copy the output to the terminal as it is produced
+		started = job["started"]
+		while True:
+			data = log.read(65536)
+			if data:
+				writeOutput(data)
+				sys.stdout.flush()
+			elif job is None or job["started"] != started:
+				# The job has been forgotten or re-run elsewhere
+				break
+			elif job["finished"] is not None and job["outputClosed"]:
+				break
+			else:
+				time.sleep(0.1)
+				job = jobInfo(jobId)
+		log.close()
+		
+		if job is None or job["finished"] is None:
+			continue
+		if job["delayExitTime"] == 0:
+			return 0
+		
+		print(separator)
+		print("%s."%(jobStatus(job).capitalize(),))
+		print("Finished: %s"%(time.ctime(job["finished"]),))
+		print(separator)
+		print("Will close in %i seconds."%(job["delayExitTime"],))
+		print("   [R] to run the command again.")
+		print("   [S] to take over the shell")
+		print("   Any other key to exit.")
+		sys.stdout.flush()
+		
+		key = readKey(job["delayExitTime"])
+		if key in ("r", "R"):
+			print("******* Running Command Again... *******")
+			rerunJob(jobId)
+		elif key in ("s", "S"):
+			os.chdir(job["cwd"])
+			os.execv("/bin/bash", ["/bin/bash"])
+		else:
+			return 0
+
+################################################################################
+# Commandline behaviour.                                                       #
+################################################################################
+
+def main(argv):
+	# Jobs run in the directory yaluJobs was started in
+	workingDirectory = os.getcwd()
+	
+	# Move into the YALU dir so that all paths from now on can be relative
+	os.chdir(os.environ["LocalYALU"])
+	
+	if len(argv) >= 3 and argv[1] == "run":
+		runJob(argv[2:], workingDirectory)
+	elif len(argv) == 2 and argv[1] == "list":
+		sys.stdout.write(statsHeader)
+		for job in listJobs():
+			print(statsLine(job))
+	elif len(argv) == 3 and argv[1] == "view":
+		sys.exit(viewJob(int(argv[2])))
+	elif len(argv) == 3 and argv[1] == "rerun":
+		rerunJob(int(argv[2]))
+	elif len(argv) == 3 and argv[1] == "kill":
+		killJob(int(argv[2]))
+	elif len(argv) == 4 and argv[1] == "kill":
+		killJob(int(argv[2]), int(argv[3]))
+	elif len(argv) == 2 and argv[1] == "supervise":
+		supervise()
+	else:
+		sys.stderr.write("Usage: yaluJobs {run command,list,view jobId,"
+		                 "rerun jobId,kill jobId [signal],supervise}\n")
+
+if __name__ == "__main__":
+	main(sys.argv)
@@ -0,0 +1,190 @@
+#!/usr/bin/python
+ ##############################################################################
+################################################################################
+####            YetAnotherLevelUp (YALU), an FVWM Configuration             ####
+####               ~ Jonathan Heathcote                                     ####
+####               ~ September 2009 - Present                               ####
+####               ~ GNU GPLv3                                              ####
+################################################################################
+ ##############################################################################
+# yaluLayout:
+#   Saves and restores the positions of the windows on a page. Usage:
+#
+#   To save the layout of the current page (or of every page) run this with
+#   Exec (it asks FVWM for the window list using FvwmCommand so it mustn't be
+#   run with PipeRead):
+#       yaluLayout snapshot [screenWidth] [screenHeight] [all]
+#
+#   To restore the layout of the current page (run with PipeRead):
+#       yaluLayout restore
+#   Prints a yaluLayoutPlace command for each saved window which FVWM runs on
+#   the next window of the same class which hasn't already been placed. All of
+#   the windows are placed by a single PipeRead.
+#
+#   The layouts are stored in LocalYALU/layout/deskD/pageXxY with one
+#   "class<TAB>x<TAB>y<TAB>width<TAB>height" line per window where the
+#   position is relative to the page.
+
+from __future__ import print_function
+
+import sys, os
+
+import yaluTheme
+
+# Where the layouts are kept (relative to LocalYALU)
+layoutDirectory = "layout"
+
+# The user state (see the FVWM State command) marking windows placed by restore
+placedState = 31
+
+# Windows belonging to these classes are never saved (e.g. the pager)
+ignoredClassPrefix = "Fvwm"
+
+def layoutFile(desk, pageX, pageY):
+	return os.path.join(layoutDirectory, "desk%s"%(desk,),
+	                    "page%sx%s"%(pageX, pageY))
+
+################################################################################
+# Window list                                                                  #
+################################################################################
+class Window:
+	def __init__(self, windowId):
+		self.windowId = windowId
+		self.x = self.y = self.width = self.height = None
+		self.desk = None
+		self.windowClass = None
+
+def readWindowList():
+	"""
+	Return a list of Windows for all of FVWM's windows (in stacking order) using
+	a single Send_WindowList request. The frame positions are relative to the
+	current viewport.
+	"""
+	import subprocess, re
+	
+	windows = {}
+	order = []
+	
+	def getWindow(windowId):
+		if windowId not in windows:
+			windows[windowId] = Window(windowId)
+			order.append(windowId)
+		return windows[windowId]
+	
+	fvwmCommand = subprocess.Popen(["FvwmCommand", "-i", "2", "Send_WindowList"],
+	                               stdout=subprocess.PIPE)
+	for line in iter(fvwmCommand.stdout.readline, b""):
+		line = line.decode("utf-8", "replace").strip()
+		if line == "end windowlist":
+			break
+		
+		match = re.match(r"(0x[0-9a-fA-F]+)\s+(frame|desktop|resource class)"
+		                 r"\s+(.*)$", line)
+		if not match:
+			continue
+		window = getWindow(match.group(1))
+		field, value = match.group(2, 3)
+		
+		if field == "frame":
+			geometry = re.match(r"x (-?\d+), y (-?\d+), width (\d+), height (\d+)",
+			                    value)
+			if geometry:
+				window.x, window.y, window.width, window.height = \
+					[int(number) for number in geometry.groups()]
+		elif field == "desktop":
+			window.desk = int(value)
+		elif field == "resource class":
+			window.windowClass = value
+	
+	# FvwmCommand may wait for further messages after the list
+	if fvwmCommand.poll() is None:
+		fvwmCommand.terminate()
+	fvwmCommand.wait()
+	
+	return [windows[windowId] for windowId in order
+	        if windows[windowId].x is not None
+	        and windows[windowId].desk is not None
+	        and windows[windowId].windowClass is not None]
+
+################################################################################
+# Snapshot and restore                                                         #
+################################################################################
+def snapshot(screenWidth, screenHeight, allPages=False):
+	"""
+	Save the layout of the current page (or of every page, replacing all of the
+	saved layouts).
+	"""
+	desk = int(os.environ["yaluDesk"])
+	pageX = int(os.environ["yaluPageX"])
+	pageY = int(os.environ["yaluPageY"])
+	
+	# Sort the windows into pages
+	layouts = {}
+	if not allPages:
+		layouts[(desk, pageX, pageY)] = []
+	for window in readWindowList():
+		if window.windowClass.startswith(ignoredClassPrefix):
+			continue
+		
+		# Work out which page the window is on from its position relative to
+		# the current page
+		offsetX = window.x // screenWidth
+		offsetY = window.y // screenHeight
+		page = (window.desk, pageX + offsetX, pageY + offsetY)
+		if allPages or page in layouts:
+			layouts.setdefault(page, []).append("%s\t%i\t%i\t%i\t%i\n"%(
+				window.windowClass,
+				window.x - (offsetX * screenWidth),
+				window.y - (offsetY * screenHeight),
+				window.width,
+				window.height,
+			))
+	
+	if allPages and os.path.isdir(layoutDirectory):
+		import shutil
+		shutil.rmtree(layoutDirectory)
+	
+	for page, lines in layouts.items():
+		filename = layoutFile(*page)
+		if not os.path.isdir(os.path.dirname(filename)):
+			os.makedirs(os.path.dirname(filename))
+		yaluTheme.writeAtomically(filename, "".join(lines))
+
+def restore():
+	"""Print the FVWM commands which restore the layout of the current page"""
+	desk = os.environ["yaluDesk"]
+	try:
+		layout = open(layoutFile(desk, os.environ["yaluPageX"],
+		                         os.environ["yaluPageY"]), "r").read()
+	except IOError:
+		return
+	
+	# Windows are only placed once
+	print("All State %i False"%(placedState,))
+	for line in layout.split("\n"):
+		if line != "":
+			windowClass, x, y, width, height = line.split("\t")
+			print("Next (\"%s\", !State %i) yaluLayoutPlace %s %s %s %s %s"%(
+				windowClass.replace("\"", "?"), placedState,
+				desk, x, y, width, height
+			))
+
+################################################################################
+# Commandline behaviour.                                                       #
+################################################################################
+
+def main(argv):
+	# Move into the YALU dir so that all paths from now on can be relative
+	os.chdir(os.environ["LocalYALU"])
+	
+	if len(argv) in (4, 5) and argv[1] == "snapshot" \
+	   and argv[4:] in ([], ["all"]):
+		snapshot(int(argv[2]), int(argv[3]), argv[4:] == ["all"])
+	elif len(argv) == 2 and argv[1] == "restore":
+		restore()
+	else:
+		sys.stderr.write("Usage: yaluLayout {snapshot screenWidth screenHeight "
+		                 "[all],restore}\n")
+
+if __name__ == "__main__":
+	main(sys.argv)
@@ -11,8 +11,31 @@
 # yaluMenu:
 #   Generates dynamic menus for YALU. Syntax:
 #      yaluMenu [menu name]
+#
+#   The menus are generated by a pool of worker processes and must be ready
+#   within menuDeadline seconds (PipeRead blocks FVWM until yaluMenu exits). The
+#   last menu generated successfully is kept in LocalYALU/menuCache and is used,
+#   with a note that it is out of date, in place of any menu which misses the
+#   deadline. The late worker carries on in the background and sends the new
+#   menu to FVWM (with FvwmCommand) once it's done.
+
+from __future__ import print_function
+
+import sys, os, marshal, time, select, errno
+import yaluIcons, yaluTheme
+
+# The longest (in seconds) FVWM is made to wait for the menus
+menuDeadline = 0.5
+
+# The number of worker processes the menus are generated by
+menuWorkers = 4
 
-import sys, os, commands, re
+# Where the last good output of each menu is kept (relative to LocalYALU)
+menuCacheDirectory = "menuCache"
+
+# Functions to call once the menu being generated has reached FVWM (see
+# runWorker)
+deliveryActions = []
 ################################################################################
 # Menu Object                                                                  #
 #   Is used to construct the neccesary code to make an Fvwm menu.              #
@@ -26,14 +49,20 @@ class Menu:
 		
 		# If the menu is dynamic bind the FVWM event to regenerate this menu
 		if dynamic:
-			self.append("DynamicPopupAction", "YaluMenu menu %s"%(self.name,))
+			self.append("DynamicPopupAction", "YaluMenu %s"%(self.name,))
 		
 		# If a title has been specified, add one
 		if title:
 			self.append(title, "Title")
 	
 	def append(self, label, command, icon = None):
-		"""Add a menu item to the menu."""
+		"""
+		Add a menu item to the menu. Icons are given by name and resolved into
+		filenames using the icon index.
+		"""
+		if icon != None:
+			icon = yaluIcons.lookup(icon)
+		
 		if icon != None:
 			icon = "%%%s%%"%(icon,)
 		else:
@@ -154,13 +183,17 @@ class GlobalShortcuts:
 			action
 		)
 	
-	def __str__(self):
-		"""Generate the appropriate bindings/menus"""
-		returnString = ""
+	def bindings(self):
+		"""
+		Generate the appropriate bindings/menus. Returns a dictionary
+		{binding: fvwmCode} where bindings are named "Key hotkey", "Stroke pattern"
+		or "Menu menuName".
+		"""
+		bindings = {}
 		for hotkey in self.shortcuts:
 			if len(self.shortcuts[hotkey]) == 1:
 				# Directly launch the program if no collisions
-				returnString += self.bindKey(hotkey, "YaluExec " + self.shortcuts[hotkey][0][1])
+				bindings["Key %s"%(hotkey,)] = self.bindKey(hotkey, "YaluExec " + self.shortcuts[hotkey][0][1])
 			else:
 				# Generate hotkey menu if there are collisions
 				hotkeyMenu = Menu(
@@ -190,18 +223,132 @@ class GlobalShortcuts:
 					hotkeyMenu.appendProgram(labelWithNewHotkey, command)
 				
 				# Add the generated menu and the key binding for that key
-				returnString += "%s\n"%(hotkeyMenu,)
-				returnString += self.bindKey(hotkey,
-				                             "Menu autoYaluMenu_hotkey_%s_and_%s"%(
-				                              	self.modifier, hotkey))
+				bindings["Menu %s"%(hotkeyMenu.name,)] = "%s\n"%(hotkeyMenu,)
+				bindings["Key %s"%(hotkey,)] = self.bindKey(hotkey,
+				                                            "Menu %s"%(hotkeyMenu.name,))
 		# Add all strokes
 		for stroke in self.strokes:
-			returnString += "Stroke %s 0 A 4 %s\n"%(stroke, self.strokes[stroke])
+			bindings["Stroke %s"%(stroke,)] = "Stroke %s 0 A 4 %s\n"%(
+				stroke, self.strokes[stroke])
+		return bindings
+	
+	def unbind(self, binding):
+		"""Return the Fvwm code which removes a binding (as named by bindings())"""
+		bindingType, _, name = binding.partition(" ")
+		if bindingType == "Key":
+			return self.bindKey(name, "-")
+		elif bindingType == "Stroke":
+			return "Stroke %s 0 A 4 -\n"%(name,)
+		else:
+			return "DestroyMenu \"%s\"\n"%(name,)
+	
+	def __str__(self):
+		"""Generate all of the bindings/menus"""
+		return "".join(self.bindings().values())
+	
+	# The file recording what was bound by the last call to changes()
+	snapshotFile = "shortcutsBound"
+	
+	def changes(self, signature):
+		"""
+		Generate only the bindings/menus which were added, changed or removed
+		since they were last bound. The bindings are only compared if the
+		signature (which should change whenever the shortcuts could) differs from
+		the one given last time. The new bindings are only recorded once the menu
+		they're part of has reached FVWM.
+		"""
+		try:
+			snapshot = marshal.loads(open(self.snapshotFile, "rb").read())
+		except (IOError, EOFError, ValueError, TypeError):
+			snapshot = {}
+		
+		# Snapshots from other versions of Python can't be compared
+		if snapshot.get("python") != sys.version_info[0]:
+			snapshot = {}
+		
+		if snapshot.get("signature") == signature:
+			return ""
+		
+		oldBindings = snapshot.get("bindings", {})
+		bindings = self.bindings()
+		
+		returnString = ""
+		for binding in sorted(oldBindings):
+			if binding not in bindings:
+				returnString += self.unbind(binding)
+		for binding in sorted(bindings):
+			if oldBindings.get(binding) != bindings[binding]:
+				returnString += bindings[binding]
+		
+		snapshot = marshal.dumps({
+			"python" : sys.version_info[0],
+			"signature" : signature,
+			"bindings" : bindings,
+		})
+		deliveryActions.append(lambda: yaluTheme.writeAtomically(
+			self.snapshotFile, snapshot))
 		return returnString
+	
+	@classmethod
+	def forgetBindings(cls):
+		"""Forget what was bound so that the next changes() binds everything"""
+		try:
+			os.remove(cls.snapshotFile)
+		except OSError:
+			pass
 
 ################################################################################
 # Menu Generator Functions                                                     #
 ################################################################################
+def readMenuFile(filename="menu"):
+	"""
+	Read the launcher's 'menu' file (see generateLauncher). Returns a list of
+	(label, command, strokePattern) tuples with None for each blank line.
+	"""
+	import re
+	
+	def extractStroke(label):
+		# Find the stroke pattern (if there is one) and strip it out of the label
+		match = re.match("([^{]*)[\s]?[{](\d+)[}]$", label)
+		if match:
+			label = match.group(1)
+			return match.group(1,2)
+		return label, None
+	
+	entries = []
+	for rawMenuData in open(filename,"r").read().split("\n"):
+		if rawMenuData == "":
+			# Blank line: add a seperator
+			entries.append(None)
+		elif rawMenuData.find("\t") != -1:
+			# Tab-separated label and command
+			label, _ , command = rawMenuData.partition("\t")
+			label, stroke = extractStroke(label)
+			entries.append((label, command, stroke))
+		else:
+			# Command/Label are the same -- just strip the ampersands for the cmd
+			label = rawMenuData
+			label, stroke = extractStroke(label)
+			command = label.replace("&","")
+			entries.append((label, command, stroke))
+	return entries
+
+def readExecHistory(filename="yaluExec_history"):
+	"""Return the list of commands run by yaluExec (oldest first)"""
+	# Load the program history
+	try:
+		rawExecHistory = open(filename, "r").read()
+	except IOError:
+		# File does not exist, assume it is blank
+		rawExecHistory = ""
+	
+	# Strip out blank lines
+	execHistory = []
+	for line in rawExecHistory.split("\n"):
+		if line.strip() != "":
+			execHistory.append(line)
+	return execHistory
+
 def generateLauncher():
 	"""
 	Main Launcher for YALU. Loads data from the 'menu' file.
@@ -219,88 +366,111 @@ def generateLauncher():
 		launcher.appendProgram(label, command)
 		shortcuts.append(label, command, stroke)
 	
-	def extractStroke(label):
-		# Find the stroke pattern (if there is one) and strip it out of the label
-		match = re.match("([^{]*)[\s]?[{](\d+)[}]$", label)
-		if match:
-			label = match.group(1)
-			return match.group(1,2)
-		return label, None
-	
 	# Add 'fixed' menu items first
 	appendWithShortcut("&Terminal", os.environ["yaluTerminal"], "456")
 	appendWithShortcut("&Web Browser", os.environ["yaluBrowser"], "74123")
 	appendWithShortcut("&Editor", os.environ["yaluEditor"], "14789")
+	launcher.append("Run...", "Exec exec \"$[YALU]/bin/yaluDmenu\"", "run")
+	launcher.append("&Applications", "Popup applications", "programs")
 	launcher.appendSpacer()
 	
 	# Load user's menu
-	for rawMenuData in open("menu","r").read().split("\n"):
-		if rawMenuData == "":
+	for entry in readMenuFile():
+		if entry == None:
 			# Blank line: add a seperator
 			launcher.appendSpacer()
-		elif rawMenuData.find("\t") != -1:
-			# Tab-separated label and command
-			label, _ , command = rawMenuData.partition("\t")
-			label, stroke = extractStroke(label)
-			appendWithShortcut(label, command, stroke)
 		else:
-			# Command/Label are the same -- just strip the ampersands for the cmd
-			label = rawMenuData
-			label, stroke = extractStroke(label)
-			command = label.replace("&","")
-			appendWithShortcut(label, command, stroke)
+			appendWithShortcut(*entry)
 	
 	# Add a quit button
 	launcher.append("Quit", "Quit", "quit")
 	
-	# Add shortcut codes to the menu
-	launcher.appendRaw(str(shortcuts))
+	# Add shortcut codes to the menu (only those which have changed since they
+	# were last bound). They can only change if the menu file or the fixed menu
+	# items change.
+	menuFileStat = os.stat("menu")
+	launcher.appendRaw(shortcuts.changes((
+		menuFileStat.st_mtime,
+		menuFileStat.st_size,
+		os.environ["yaluTerminal"],
+		os.environ["yaluBrowser"],
+		os.environ["yaluEditor"],
+	)))
 	return launcher
 
+def generateApplications():
+	"""
+	Create the menu of installed application categories. The menu for each
+	category is only generated when it's opened.
+	"""
+	import yaluApplications
+	
+	menu = Menu("applications", True, "Applications")
+	for category, label in yaluApplications.getApplicationIndex().getCategories():
+		categoryMenu = Menu("applications_%s"%(category,))
+		menu.appendRaw(str(categoryMenu).rstrip("\n"))
+		menu.append(label, "Popup %s"%(categoryMenu.name,))
+	return menu
+
+def generateApplicationCategory(category):
+	"""Create the menu of the installed applications in a category"""
+	import yaluApplications
+	
+	menu = Menu("applications_%s"%(category,))
+	index = yaluApplications.getApplicationIndex()
+	for name, command, icon, terminal in index.getApplications(category):
+		if terminal:
+			command = "%s -e %s"%(os.environ["yaluTerminal"], command)
+		# Icons given as filenames are looked up in the theme by name
+		if icon.startswith("/"):
+			icon = os.path.splitext(os.path.basename(icon))[0]
+		menu.append(name.replace("\"", "'").replace("&", "&&"),
+		            "YaluExec %s"%(command,), icon or None)
+	return menu
+
 def generateExecOutput():
 	"""Create Exec Output viewer menu"""
-	menu = Menu("execOutput", True, "View Command Output")
+	import signal, yaluJobs
 	
-	# A list of screen sessions started by yalu
-	sessions = []
+	menu = Menu("execOutput", True, "View Command Output")
 	
-	# Get a list of all screen sessions started by yalu
-	for line in commands.getoutput("screen -ls").split("\n"):
-		# Yalu screen sessions are in the format yalu_[id]_[firstWordOfCmd]
-		regex = r"\s*\d+[.]yalu_(\d+_\S+)"
-		match = re.match(regex, line)
-		if match:
-			sessions.append(match.group(1))
-	
-	# Sort by ID (launch ID order)
-	sessions.sort()
-	
-	# Add each session to the menu
-	for session in sessions:
-		pid, _ , name = session.partition("_")
-		menu.append(
-			"%s (%s)"%(name, pid),
-			"Exec exec $[yaluTerminal] -e \"screen -rx 'yalu_%s'\""%(session,),
-			name
-		)
+	# Add each job known to the supervisor (in launch order) with a submenu to
+	# view its output or kill it
+	for job in yaluJobs.listJobs():
+		jobId = job["jobId"]
+		name = os.path.basename(job["command"][0])
+		jobCommand = "Exec exec \"$[YALU]/bin/yaluPy\" yaluJobs %%s %i"%(jobId,)
+		
+		# The title is the full command (made safe to use as a label)
+		title = yaluJobs.quoteCommand(job["command"])
+		if len(title) > 60:
+			title = title[:57] + "..."
+		title = title.replace("\"", "'").replace("&", "&&")
+		
+		jobMenu = Menu("execOutput_%i"%(jobId,), False, title)
+		jobMenu.append("View &Output",
+		               "Exec exec $[yaluTerminal] -e "
+		               "\"$[YALU]/bin/yaluPy yaluJobs view %i\""%(jobId,))
+		if job["finished"] is None:
+			jobMenu.append("&Kill", jobCommand%("kill",))
+			jobMenu.append("Kill (&Force)", "%s %i"%(jobCommand%("kill",),
+			                                         signal.SIGKILL))
+			usage = yaluJobs.formatUsage(job)
+		else:
+			jobMenu.append("&Run Again", jobCommand%("rerun",))
+			usage = yaluJobs.jobStatus(job)
+		menu.appendRaw(str(jobMenu).rstrip("\n"))
+		
+		# The usage is shown in a second column
+		menu.append("%s (%i)\t%s"%(name, jobId, usage),
+		            "Popup execOutput_%i"%(jobId,), name)
 	return menu
 
 def generateExecHistory():
 	"""Create a menu with recently/frequently used programs"""
 	menu = Menu("execHistory")
 	
-	# Load the program history
-	try:
-		rawExecHistory = open("yaluExec_history", "r").read()
-	except IOError:
-		# File does not exist, assume it is blank
-		rawExecHistory = ""
-	
-	# Strip out blank lines
-	execHistory = []
-	for line in rawExecHistory.split("\n"):
-		if line.strip() != "":
-			execHistory.append(line)
+	execHistory = readExecHistory()
 	
 	if os.environ["yaluExecHistoryType"] == "recent":
 		# Add appropriate title
@@ -356,7 +526,7 @@ def generateConfigMenu(config, title=None):
 	menu.defaultOptionCommand = optionCommand(config.default)
 	menu.selectedOptionCommand = optionCommand(config.value)
 	
-	print "#" + menu.selectedOptionCommand
+	print("#" + menu.selectedOptionCommand)
 	
 	for value in config.values:
 		if value != None:
@@ -364,7 +534,7 @@ def generateConfigMenu(config, title=None):
 				if value[1] != None:
 					# A value with a different label
 					menu.appendRadio(value[0], optionCommand(value[1]))
-					print "#" + optionCommand(value[1])
+					print("#" + optionCommand(value[1]))
 				else:
 					# A value which shares its value and label
 					menu.appendRadio(value[0], optionCommand(value[0]))
@@ -391,28 +561,245 @@ def generateConfigMenu(config, title=None):
 # tuple containing a refrence to a function and a list of arguments
 yaluMenuFunctions = {
 	"launcher" : (generateLauncher, []),
+	"applications" : (generateApplications, []),
 	"execOutput" : (generateExecOutput, []),
 	"execHistory" : (generateExecHistory, []),
 }
 
-#Add menus for all the options from yaluConfig
-import yaluConfig
-for option in yaluConfig.yaluOptions:
-	yaluMenuFunctions[option] = (
-		generateConfigMenu,
-		[yaluConfig.Option(option)]
-	)
+def getMenuFunction(name):
+	"""
+	Return the (function, arguments) tuple which generates a menu. Menus for the
+	options from yaluConfig are named after the option (optionally followed by
+	"Config", the name of the generated menu) and the menus for application
+	categories are named "applications_category".
+	"""
+	if name in yaluMenuFunctions:
+		return yaluMenuFunctions[name]
+	
+	if name.startswith("applications_"):
+		return (generateApplicationCategory, [name[len("applications_"):]])
+	
+	# Only needed for the option menus
+	import yaluConfig
+	
+	if name not in yaluConfig.getYaluOptions() and name.endswith("Config"):
+		name = name[:-len("Config")]
+	return (generateConfigMenu, [yaluConfig.Option(name)])
 
-if __name__ == "__main__":
+def getMenuName(name):
+	"""The name of the menu generated for a name accepted by getMenuFunction"""
+	if name in yaluMenuFunctions or name.startswith("applications_"):
+		return name
+	
+	import yaluConfig
+	
+	if name in yaluConfig.getYaluOptions():
+		return "%sConfig"%(name,)
+	return name
+
+def allMenuNames():
+	import yaluConfig
+	return list(yaluMenuFunctions) + list(yaluConfig.getYaluOptions())
+
+################################################################################
+# Deadline-bounded generation                                                  #
+#   Menus are shared between a pool of forked workers which write each menu   #
+#   to a pipe as "menuName length\n" followed by the menu's code. Each menu    #
+#   received is acknowledged with a byte on a second pipe. Menus which haven't #
+#   arrived by the deadline are served from the cache instead and the late     #
+#   worker is abandoned (a worker stuck on a hung mount can't be interrupted). #
+################################################################################
+def menuCacheFile(menuName):
+	return os.path.join(menuCacheDirectory, menuName)
+
+def staleMenu(menuName):
+	"""
+	Return the cached code for a menu with an entry added noting that it is out
+	of date (or an empty menu if it has never been generated).
+	"""
+	try:
+		code = open(menuCacheFile(menuName), "r").read()
+	except IOError:
+		code = str(Menu(menuName))
+	return code + "AddToMenu \"%s\" \"(Out of date, refreshing...)\" Nop\n"%(
+		menuName,)
+
+def writeAll(fileNo, data):
+	while data:
+		data = data[os.write(fileNo, data):]
+
+def runWorker(names, output, acks):
+	"""
+	Generate menus in a worker, writing each to the cache and then to output. If
+	yaluMenu doesn't acknowledge a menu (on acks) it has given up on the worker
+	and the menus are sent to FVWM instead. Menus which another worker is still
+	generating are skipped (the other worker will send its menu to FVWM when
+	it's done).
+	"""
+	import fcntl
+	
+	for name in names:
+		menuName = getMenuName(name)
+		lock = open(menuCacheFile(menuName) + ".lock", "a")
+		try:
+			fcntl.flock(lock.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+		except IOError:
+			continue
+		
+		del deliveryActions[:]
+		function, args = getMenuFunction(name)
+		code = str(function(*args))
+		yaluTheme.writeAtomically(menuCacheFile(menuName), code)
+		
+		if not isinstance(code, bytes):
+			code = code.encode("utf-8")
+		delivered = False
+		try:
+			if output is not None:
+				writeAll(output, ("%s %i\n"%(name, len(code))).encode("utf-8"))
+				writeAll(output, code)
+				delivered = os.read(acks, 1) != b""
+		except OSError:
+			pass
+		if not delivered:
+			# The pipe was closed: the stale menus are being used
+			output = None
+			import subprocess
+			delivered = subprocess.call(["FvwmCommand", "Read \"%s\""%(
+				os.path.abspath(menuCacheFile(menuName)),)]) == 0
+		
+		if delivered:
+			for action in deliveryActions:
+				action()
+		lock.close()
+
+def startWorker(names, otherWorkers):
+	"""
+	Fork a worker to generate some menus, returns the pipe it writes to and the
+	pipe its menus are acknowledged on. otherWorkers are the pipes of the
+	workers already started.
+	"""
+	readFd, writeFd = os.pipe()
+	ackReadFd, ackWriteFd = os.pipe()
+	if os.fork() != 0:
+		os.close(writeFd)
+		os.close(ackReadFd)
+		return readFd, ackWriteFd
+	
+	try:
+		try:
+			# Don't keep FVWM's PipeRead or the other workers' pipes open (or
+			# print anything into them)
+			for fileNo in [readFd, ackWriteFd] + list(otherWorkers):
+				os.close(fileNo)
+			devnull = os.open(os.devnull, os.O_RDWR)
+			os.dup2(devnull, sys.stdout.fileno())
+			runWorker(names, writeFd, ackReadFd)
+		except:
+			import traceback
+			traceback.print_exc()
+			sys.stderr.flush()
+	finally:
+		os._exit(0)
+
+def readMenus(data):
+	"""
+	Split the complete menus from the start of a worker's output. Returns a list
+	of (name, code) tuples and the remaining (incomplete) data.
+	"""
+	menus = []
+	while b"\n" in data:
+		header, _, rest = data.partition(b"\n")
+		name, _, length = header.decode("utf-8").rpartition(" ")
+		if len(rest) < int(length):
+			break
+		code = rest[:int(length)]
+		if not isinstance(code, str):
+			code = code.decode("utf-8")
+		menus.append((name, code))
+		data = rest[int(length):]
+	return menus, data
+
+def generateMenus(names, deadline=menuDeadline):
+	"""
+	Generate the named menus concurrently. Returns a list of the code for each
+	menu (using the stale cached code for any which miss the deadline).
+	"""
+	if not os.path.isdir(menuCacheDirectory):
+		os.mkdir(menuCacheDirectory)
+	
+	# Make sure any output buffered so far isn't repeated by the workers
+	sys.stdout.flush()
+	sys.stderr.flush()
+	
+	# Share the menus out between the workers. workers is {readFd: [ackFd, data]}
+	workers = {}
+	for worker in range(min(len(names), menuWorkers)):
+		otherWorkers = [fileNo for readFd in workers
+		                for fileNo in (readFd, workers[readFd][0])]
+		readFd, ackFd = startWorker(names[worker::menuWorkers], otherWorkers)
+		workers[readFd] = [ackFd, b""]
+	
+	finished = {}
+	
+	def closeWorker(readFd):
+		os.close(readFd)
+		os.close(workers.pop(readFd)[0])
+	
+	def readWorkers(timeout):
+		"""Read (and acknowledge) menus from any workers with output waiting"""
+		try:
+			readable = select.select(list(workers), [], [], timeout)[0]
+		except select.error as e:
+			if e.args[0] == errno.EINTR:
+				return True
+			raise
+		for readFd in readable:
+			data = os.read(readFd, 65536)
+			if data:
+				worker = workers[readFd]
+				menus, worker[1] = readMenus(worker[1] + data)
+				for name, code in menus:
+					try:
+						os.write(worker[0], b"\n")
+					except OSError:
+						continue
+					finished[name] = code
+			else:
+				closeWorker(readFd)
+		return readable != []
+	
+	endTime = time.time() + deadline
+	while workers:
+		remaining = endTime - time.time()
+		if remaining <= 0:
+			break
+		readWorkers(remaining)
+	
+	# Collect any menus which arrived just before the deadline and abandon the
+	# late workers
+	while workers and readWorkers(0):
+		pass
+	for readFd in list(workers):
+		closeWorker(readFd)
+	
+	return [finished.get(name) or staleMenu(getMenuName(name))
+	        for name in names]
+
+def main(argv):
 	# Move into the YALU dir so that all paths from now on can be relative
 	os.chdir(os.environ["LocalYALU"])
 	
-	if len(sys.argv) == 2:
+	if len(argv) == 2:
 		# Print the menu item specified as the second argument
-		function, args = yaluMenuFunctions[sys.argv[1]]
-		print function(*args)
+		names = [argv[1]]
 	else:
-		# Print all menu items
-		for menu in yaluMenuFunctions:
-			function, args = yaluMenuFunctions[menu]
-			print function(*args)
+		# Print all menu items (re-binding all of the launcher's shortcuts)
+		GlobalShortcuts.forgetBindings()
+		names = allMenuNames()
+	
+	for code in generateMenus(names):
+		print(code)
+
+if __name__ == "__main__":
+	main(sys.argv)
@@ -0,0 +1,435 @@
+#!/usr/bin/python
+ ##############################################################################
+################################################################################
+####            YetAnotherLevelUp (YALU), an FVWM Configuration             ####
+####               ~ Jonathan Heathcote                                     ####
+####               ~ September 2009 - Present                               ####
+####               ~ GNU GPLv3                                              ####
+################################################################################
+ ##############################################################################
+# yaluReplay:
+#   Replays a recorded trace of user interactions against the real YALU scripts
+#   using a local stand-in for FVWM and reports the wall-clock latency of each
+#   event. No X server or FVWM is required. Usage:
+#      yaluReplay [options] traceFile
+#
+#   Options:
+#      --yalu dir       The YALU installation to test (defaults to $YALU or
+#                       the one containing this script)
+#      --local dir      The LocalYALU directory to use (defaults to a scratch
+#                       copy of the installation's user files)
+#      --python interp  Run the python scripts with the given interpreter (sets
+#                       yaluPython for yaluPy)
+#      --stub program   Replace a program with one that does nothing (may be
+#                       given more than once, e.g. --stub feh --stub xlock)
+#      --repeat n       Replay the trace n times
+#      --commands file  Write every FVWM command the scripts sent to a file
+#      --verbose        Print the latency of every event as it happens
+#
+#   Trace files contain one event per line (blank lines and lines starting with
+#   a # are ignored). Arguments are split as in a shell. Events are:
+#      onPageChange desk pageX pageY
+#      YaluMenu [menuName]
+#      InteliTile {place,tallPlace,widePlace} screenWxH x,y,w,h [x,y,w,h ...]
+#         The first rectangle is the window being placed, any further
+#         rectangles are the other windows on the page.
+#      YaluExec command [command's options]
+#      setTheme [force]
+#      Sleep seconds
+#
+#   Each event runs the function of the same name in the installation's
+#   fvwmConfig (the SetEnv, PipeRead, Exec, Schedule, Deschedule and All
+#   commands in it and any functions it calls) so that alternative
+#   implementations (e.g. another checkout given with --yalu) can be compared
+#   directly. Commands delayed with Schedule (e.g. setting the wallpaper after a
+#   page change) are run once due and reported as "(scheduled)".
+
+from __future__ import print_function
+
+import sys, os, time, shutil, tempfile, shlex, subprocess, re, optparse
+
+################################################################################
+# Fake FVWM                                                                    #
+#   Keeps track of the environment FVWM would export to its children and       #
+#   emulates PipeRead, Exec and the FvwmCommand interface.                     #
+################################################################################
+class FakeFvwm:
+	def __init__(self, yaluDir, localDir, python=None, stubs=()):
+		self.yaluDir = yaluDir
+		self.localDir = localDir
+		
+		# Every command FVWM was asked to run (via PipeRead or FvwmCommand)
+		self.commands = []
+		
+		# Commands waiting to be run by Schedule as {commandId: (time, action)}
+		self.scheduled = {}
+		
+		# Directory containing FvwmCommand and any other stubbed out programs
+		self.stubDir = tempfile.mkdtemp(prefix="yaluReplay")
+		self.commandLog = os.path.join(self.stubDir, "FvwmCommand.log")
+		open(self.commandLog, "w").close()
+		self.__writeStub("FvwmCommand",
+		                 "printf '%%s\\n' \"$*\" >> \"%s\"\n"%(self.commandLog,))
+		for program in stubs:
+			self.__writeStub(program, "exit 0\n")
+		
+		# The environment variables FVWM would pass on
+		self.env = dict(os.environ)
+		self.env["PATH"] = "%s:%s"%(self.stubDir, self.env.get("PATH", ""))
+		self.env["YALU"] = yaluDir
+		self.env["LocalYALU"] = localDir
+		# Only the LocalYALU directory should be written to (not the checkout
+		# under test)
+		self.env["PYTHONDONTWRITEBYTECODE"] = "1"
+		if python:
+			self.env["yaluPython"] = python
+		
+		# The functions the events are replayed with
+		self.loadFunctions(os.path.join(yaluDir, "fvwmConfig"))
+		
+		# Load the defaults and then the user's settings as fvwmConfig does
+		self.pipeRead("%s printAllDefaults"%(self.script("yaluConfig.py"),))
+		self.read(os.path.join(localDir, "yaluConfig"))
+	
+	def loadFunctions(self, filename):
+		"""
+		Read the (immediate) commands of every function defined in an FVWM config
+		file into self.functions as {functionName: [command, ...]}.
+		"""
+		self.functions = {}
+		function = None
+		lines = open(filename, "r").read().split("\n")
+		while lines:
+			line = lines.pop(0).strip()
+			# Join continued lines
+			while line.endswith("\\") and lines:
+				line = line[:-1] + lines.pop(0).strip()
+			
+			words = line.split(None, 2)
+			if len(words) >= 2 and words[0] == "DestroyFunc":
+				self.functions.pop(words[1], None)
+			elif len(words) >= 2 and words[0] == "AddToFunc":
+				function = words[1]
+				self.functions.setdefault(function, [])
+				words = ("+ " + " ".join(words[2:])).split(None, 2)
+			elif words and words[0] == "AddToMenu":
+				function = None
+			
+			# Only the commands run immediately (the I context) are replayed
+			if function is not None and len(words) == 3 and words[0] == "+" \
+			   and words[1].strip("\"") == "I":
+				self.functions[function].append(words[2])
+	
+	def __writeStub(self, name, body):
+		filename = os.path.join(self.stubDir, name)
+		open(filename, "w").write("#!/bin/sh\n" + body)
+		os.chmod(filename, 0o755)
+	
+	def cleanUp(self):
+		shutil.rmtree(self.stubDir, True)
+	
+	def script(self, name):
+		"""
+		Return the shell snippet which runs one of the scripts in bin/. Python
+		scripts are run via yaluPy as in fvwmConfig.
+		"""
+		if name.endswith(".py"):
+			return "\"%s\" %s"%(os.path.join(self.yaluDir, "bin", "yaluPy"),
+			                    name[:-len(".py")])
+		else:
+			return "\"%s\""%(os.path.join(self.yaluDir, "bin", name),)
+	
+	def expand(self, command):
+		"""Expand $[variable] references (and $$) as FVWM would"""
+		return re.sub(r"\$\$|\$\[([^\]]+)\]",
+		              lambda match: "$" if match.group(0) == "$$"
+		                            else self.env.get(match.group(1), ""),
+		              command)
+	
+	def execute(self, command):
+		"""Interpret a command as if it had been sent to FVWM"""
+		command = command.strip()
+		self.commands.append(command)
+		
+		match = re.match(r"SetEnv\s+(\S+)\s+(.*)$", command, re.IGNORECASE)
+		if match:
+			name, value = match.group(1, 2)
+			value = self.expand(value.strip())
+			if len(value) >= 2 and value.startswith("\"") and value.endswith("\""):
+				value = re.sub(r"\\(.)", r"\1", value[1:-1])
+			self.env[name] = value
+	
+	def read(self, filename):
+		"""Emulate FVWM's Read command (only SetEnv has any effect here)"""
+		try:
+			config = open(filename, "r").read()
+		except IOError:
+			return
+		for line in config.split("\n"):
+			if line.strip().startswith("SetEnv"):
+				self.execute(line)
+	
+	def __collectFvwmCommands(self):
+		"""Execute any commands which arrived via FvwmCommand"""
+		commands = open(self.commandLog, "r").read()
+		open(self.commandLog, "w").close()
+		for command in commands.split("\n"):
+			if command.strip() != "":
+				self.execute(command)
+	
+	def pipeRead(self, command):
+		"""Run a command and execute its output as FVWM commands"""
+		process = subprocess.Popen(self.expand(command), shell=True,
+		                           stdout=subprocess.PIPE, env=self.env,
+		                           cwd=os.path.expanduser("~"))
+		output = process.communicate()[0].decode("utf-8", "replace")
+		for line in output.split("\n"):
+			if line.strip() != "":
+				self.execute(line)
+		self.__collectFvwmCommands()
+	
+	def execCommand(self, command):
+		"""
+		Run a command using the shell set by ExecUseShell. Unlike FVWM this waits
+		for the command to complete so that the time taken can be measured.
+		"""
+		subprocess.call([os.path.join(self.yaluDir, "bin", "yaluShell"),
+		                 "-c", self.expand(command)],
+		                env=self.env, cwd=os.path.expanduser("~"))
+		self.__collectFvwmCommands()
+	
+	def substitute(self, command, args, variables):
+		"""
+		Expand a function's $* and $0-$9 arguments and the $[...] variables FVWM
+		would set (e.g. $[w.x]). Environment variables are left for expand().
+		"""
+		command = command.replace("$*", " ".join(args))
+		command = re.sub(r"\$([0-9])",
+		                 lambda match: (list(args) + [""] * 10)[int(match.group(1))],
+		                 command)
+		return re.sub(r"\$\[([^\]]+)\]",
+		              lambda match: variables.get(match.group(1), match.group(0)),
+		              command)
+	
+	def callFunction(self, name, args=(), variables={}, windows=()):
+		"""
+		Run the commands of a function from fvwmConfig. variables are the $[...]
+		variables FVWM would set and windows are the $[w.*] variables of each
+		window an All command would match.
+		"""
+		if name not in self.functions:
+			raise ValueError("fvwmConfig does not define the function %s"%(name,))
+		for command in self.functions[name]:
+			self.runCommand(command, args, variables, windows)
+	
+	def runCommand(self, command, args=(), variables={}, windows=()):
+		"""
+		Run a command from a function. Only the commands which matter to YALU's
+		scripts have any effect, the rest are ignored.
+		"""
+		if command.split(None, 1)[0].lower() == "all":
+			# The windows given are taken to be the ones the conditions match
+			action = command.split(None, 1)[1].strip()
+			if action.startswith("("):
+				action = action[action.index(")") + 1:]
+			for window in windows:
+				windowVariables = dict(variables)
+				windowVariables.update(window)
+				self.runCommand(action.strip(), args, windowVariables)
+			return
+		
+		command = self.substitute(command, args, variables)
+		words = command.split(None, 1)
+		keyword = words[0].lower()
+		rest = words[1].strip() if len(words) == 2 else ""
+		
+		if keyword == "setenv":
+			self.execute(command)
+		elif keyword == "piperead":
+			if rest.startswith("\"") and rest.endswith("\""):
+				rest = rest[1:-1]
+			self.pipeRead(rest)
+		elif keyword == "exec":
+			self.execCommand(rest)
+		elif keyword == "schedule":
+			# Schedule delay [commandId] command
+			delay, _, action = rest.partition(" ")
+			commandId, _, scheduledCommand = action.strip().partition(" ")
+			if not commandId.isdigit():
+				commandId, scheduledCommand = object(), action
+			self.schedule(int(delay) / 1000.0, commandId,
+			              lambda: self.runCommand(scheduledCommand.strip(), args,
+			                                      variables))
+		elif keyword == "deschedule":
+			self.deschedule(rest)
+		elif words[0] in self.functions:
+			self.callFunction(words[0], shlex.split(rest), variables, windows)
+	
+	def schedule(self, delay, commandId, action):
+		"""Emulate FVWM's Schedule command (action is a function of no arguments)"""
+		self.scheduled[commandId] = (time.time() + delay, action)
+	
+	def deschedule(self, commandId):
+		"""Emulate FVWM's Deschedule command"""
+		self.scheduled.pop(commandId, None)
+	
+	def runScheduled(self, flush=False):
+		"""
+		Run any scheduled commands which are due (or all of them if flush is set)
+		and return the time taken by each.
+		"""
+		latencies = []
+		for commandId, (due, action) in sorted(self.scheduled.items(),
+		                                       key=lambda item: item[1][0]):
+			if flush or due <= time.time():
+				del self.scheduled[commandId]
+				start = time.time()
+				action()
+				latencies.append(time.time() - start)
+		return latencies
+
+################################################################################
+# Events                                                                       #
+#   Each event calls the function of the same name in fvwmConfig with the      #
+#   variables FVWM would have set for it.                                      #
+################################################################################
+def windowVariables(text):
+	"""Return the $[w.*] variables of a window given as an x,y,w,h rectangle"""
+	x, y, width, height = text.split(",")
+	return {"w.x" : x, "w.y" : y, "w.width" : width, "w.height" : height}
+
+def onPageChange(fvwm, desk, pageX, pageY):
+	fvwm.callFunction("onPageChange", (), {
+		"desk.n" : desk, "page.nx" : pageX, "page.ny" : pageY})
+
+def yaluMenu(fvwm, *menuName):
+	fvwm.callFunction("YaluMenu", menuName)
+
+def inteliTile(fvwm, mode, screenSize, target, *windows):
+	width, height = screenSize.split("x")
+	variables = windowVariables(target)
+	variables.update({"vp.width" : width, "vp.height" : height})
+	fvwm.callFunction("InteliTile", (mode,), variables,
+	                  [windowVariables(window) for window in windows])
+
+def yaluExec(fvwm, *command):
+	fvwm.callFunction("YaluExec", command)
+
+def setTheme(fvwm, *force):
+	fvwm.callFunction("setTheme", force)
+
+replayEvents = {
+	"onPageChange" : onPageChange,
+	"YaluMenu" : yaluMenu,
+	"InteliTile" : inteliTile,
+	"YaluExec" : yaluExec,
+	"setTheme" : setTheme,
+}
+
+################################################################################
+# Trace replay                                                                 #
+################################################################################
+def loadTrace(filename):
+	"""Return a list of (eventName, [arguments]) tuples from a trace file"""
+	trace = []
+	for line in open(filename, "r").read().split("\n"):
+		if line.strip() == "" or line.strip().startswith("#"):
+			continue
+		event = shlex.split(line)
+		trace.append((event[0], event[1:]))
+	return trace
+
+def replay(fvwm, trace, verbose=False):
+	"""
+	Replay a trace and return a dictionary of {eventName: [latencies]}. The time
+	taken by scheduled commands is recorded under "(scheduled)". Anything still
+	scheduled at the end of the trace is run then.
+	"""
+	latencies = {}
+	
+	def runScheduled(flush=False):
+		for latency in fvwm.runScheduled(flush):
+			latencies.setdefault("(scheduled)", []).append(latency)
+			if verbose:
+				print("%8.1fms (scheduled)"%(latency * 1000,))
+	
+	for eventName, args in trace:
+		runScheduled()
+		if eventName == "Sleep":
+			time.sleep(float(args[0]))
+			runScheduled()
+			continue
+		
+		start = time.time()
+		replayEvents[eventName](fvwm, *args)
+		latency = time.time() - start
+		
+		latencies.setdefault(eventName, []).append(latency)
+		if verbose:
+			print("%8.1fms %s %s"%(latency * 1000, eventName, " ".join(args)))
+	runScheduled(True)
+	return latencies
+
+def printReport(latencies):
+	print("%-14s %6s %9s %9s %9s %9s"%(
+		"Event", "Count", "Mean", "Median", "95%", "Max"))
+	for eventName in sorted(latencies):
+		times = sorted(latencies[eventName])
+		print("%-14s %6i %7.1fms %7.1fms %7.1fms %7.1fms"%(
+			eventName,
+			len(times),
+			1000 * sum(times) / len(times),
+			1000 * times[len(times) // 2],
+			1000 * times[min(len(times) - 1, int(len(times) * 0.95))],
+			1000 * times[-1],
+		))
+
+def makeScratchLocalDir(yaluDir):
+	"""Create a LocalYALU directory containing a copy of the user's files"""
+	localDir = tempfile.mkdtemp(prefix="yaluReplayLocal")
+	for filename in ("menu", "yaluConfig"):
+		if os.path.isfile(os.path.join(yaluDir, filename)):
+			shutil.copy(os.path.join(yaluDir, filename), localDir)
+	return localDir
+
+################################################################################
+# Commandline behaviour.                                                       #
+################################################################################
+
+def main(argv):
+	parser = optparse.OptionParser(usage="%prog [options] traceFile")
+	parser.add_option("--yalu", default=os.environ.get("YALU")
+	                  or os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+	parser.add_option("--local", default=None)
+	parser.add_option("--python", default=None)
+	parser.add_option("--stub", action="append", default=[])
+	parser.add_option("--repeat", type="int", default=1)
+	parser.add_option("--commands", default=None)
+	parser.add_option("--verbose", action="store_true", default=False)
+	options, args = parser.parse_args(argv[1:])
+	
+	if len(args) != 1:
+		parser.error("A single trace file must be given")
+	
+	yaluDir = os.path.abspath(options.yalu)
+	localDir = options.local or makeScratchLocalDir(yaluDir)
+	
+	fvwm = FakeFvwm(yaluDir, os.path.abspath(localDir),
+	                options.python, options.stub)
+	try:
+		trace = loadTrace(args[0])
+		latencies = {}
+		for _ in range(options.repeat):
+			for eventName, times in replay(fvwm, trace, options.verbose).items():
+				latencies.setdefault(eventName, []).extend(times)
+		printReport(latencies)
+		
+		if options.commands:
+			open(options.commands, "w").write("\n".join(fvwm.commands) + "\n")
+	finally:
+		fvwm.cleanUp()
+		if not options.local:
+			shutil.rmtree(localDir, True)
+
+if __name__ == "__main__":
+	main(sys.argv)
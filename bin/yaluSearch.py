@@ -0,0 +1,389 @@
+#!/usr/bin/python
+ ##############################################################################
+################################################################################
+####            YetAnotherLevelUp (YALU), an FVWM Configuration             ####
+####               ~ Jonathan Heathcote                                     ####
+####               ~ September 2009 - Present                               ####
+####               ~ GNU GPLv3                                              ####
+################################################################################
+ ##############################################################################
+# yaluSearch:
+#   Finds things to run. Searches the launcher's 'menu' file (labels and
+#   commands), the programs in the PATH and the yaluExec history. Syntax:
+#      yaluSearch list
+#         Print everything which can be run, most frequently used first.
+#      yaluSearch query text [limit]
+#         Print the best matches for some (fuzzily) typed text, best first.
+#      yaluSearch command name
+#         Print the command to run for a name printed by list or query.
+#
+#   Everything is kept in a prebuilt index which is only rebuilt when the menu
+#   file, history file or a directory in the PATH changes. Matches are found
+#   using the index's trigrams (or word prefixes for short queries) and ranked
+#   by how well they match and how often they have been launched.
+
+from __future__ import print_function
+
+import sys, os, marshal, math, heapq, array
+
+import yaluTheme
+
+# The number of history entries used to count launch frequencies
+historyLength = 1000
+
+# How much more important a good match is than frequent use
+frequencyWeight = 20
+
+# The maximum number of candidates to score for a query (the most frequently
+# used candidates are scored when there are more)
+maxScored = 200
+
+################################################################################
+# Candidate gathering                                                          #
+################################################################################
+def pathDirectories():
+	"""The directories searched for programs (as used by yaluDmenu)"""
+	directories = os.environ.get("PATH", "").split(":")
+	directories.append(os.path.join(os.environ.get("HOME", ""), "bin"))
+	return [directory for directory in directories if directory != ""]
+
+def indexSignature(menuFile, historyFile):
+	"""Changes whenever the index may need to be rebuilt"""
+	def mtime(filename):
+		try:
+			return os.stat(filename).st_mtime
+		except OSError:
+			return None
+	return [(filename, mtime(filename))
+	        for filename in [menuFile, historyFile] + pathDirectories()]
+
+def gatherCandidates(menuFile, historyFile):
+	"""
+	Return a list of (name, command) pairs for everything which can be run and
+	a dictionary {command: timesLaunched}.
+	"""
+	# Only needed when (re)building the index
+	import yaluMenu
+	
+	candidates = []
+	seenCommands = set()
+	
+	def add(name, command):
+		if command not in seenCommands:
+			seenCommands.add(command)
+			candidates.append((name, command))
+	
+	# Launcher entries
+	try:
+		for entry in yaluMenu.readMenuFile(menuFile):
+			if entry != None:
+				label, command, stroke = entry
+				add(label.replace("&", "").strip(), command)
+	except IOError:
+		pass
+	
+	# Previously run commands
+	history = yaluMenu.readExecHistory(historyFile)[-historyLength:]
+	frequency = {}
+	for command in history:
+		command = command.strip()
+		frequency[command] = frequency.get(command, 0) + 1
+		add(command, command)
+	
+	# Programs in the PATH
+	for directory in pathDirectories():
+		try:
+			filenames = os.listdir(directory)
+		except OSError:
+			continue
+		for filename in filenames:
+			path = os.path.join(directory, filename)
+			if not os.path.isdir(path) and os.access(path, os.X_OK):
+				add(filename, filename)
+	
+	return candidates, frequency
+
+################################################################################
+# Search Index Object                                                          #
+################################################################################
+def trigrams(text):
+	return set(text[i:i+3] for i in range(len(text) - 2))
+
+def charMask(text):
+	"""A bit-mask of the characters in some text (for quick rejection)"""
+	mask = 0
+	for char in text:
+		if "a" <= char <= "z":
+			mask |= 1 << (ord(char) - ord("a"))
+		elif "0" <= char <= "9":
+			mask |= 1 << (26 + ord(char) - ord("0"))
+		else:
+			# Everything else shares the remaining bits
+			mask |= 1 << (36 + ord(char) % 27)
+	return mask
+
+def packIds(ids):
+	"""Pack a list of candidate ids into a string"""
+	packed = array.array("i", ids)
+	if hasattr(packed, "tobytes"):
+		return packed.tobytes()
+	else:
+		return packed.tostring()
+
+def unpackIds(data):
+	"""Unpack a string packed by packIds into an array of candidate ids"""
+	ids = array.array("i")
+	if hasattr(ids, "frombytes"):
+		ids.frombytes(data)
+	else:
+		ids.fromstring(data)
+	return ids
+
+noIds = packIds([])
+
+class SearchIndex:
+	"""
+	An index of candidates. Each table of the index is stored as a separately
+	marshalled string and is only unpacked when a query needs it so that
+	loading the index (once per query) stays quick.
+	"""
+	# The tables which make up the index:
+	#   names: The name shown to the user for each candidate
+	#   commands: The command run for each candidate
+	#   frequency: The number of times each candidate has been launched
+	#   order: Candidate ids ranked by frequency (then shortest name)
+	#   ranks: The position of each candidate in order
+	#   masks: The charMask of each (lower case) name
+	#   trigrams: {trigram: packed ids of the names containing it}
+	#   prefixes: {prefix: packed ids of the best ranked (up to maxScored)
+	#              names with a word starting with the (1 or 2 char) prefix}
+	tableNames = ["names", "commands", "frequency", "order", "ranks", "masks",
+	              "trigrams", "prefixes"]
+	
+	# Tables which are stored packed by packIds
+	packedTables = ["order", "ranks"]
+	
+	def __init__(self, tables):
+		"""tables is a dictionary {tableName: marshalledTable}"""
+		self.tables = tables
+	
+	def __getattr__(self, name):
+		"""Unpack tables when first used"""
+		if name not in self.tableNames:
+			raise AttributeError(name)
+		table = marshal.loads(self.tables[name])
+		if name in self.packedTables:
+			table = unpackIds(table)
+		setattr(self, name, table)
+		return table
+	
+	@staticmethod
+	def build(menuFile="menu", historyFile="yaluExec_history"):
+		candidates, launches = gatherCandidates(menuFile, historyFile)
+		names = [name for name, command in candidates]
+		lowerNames = [name.lower() for name in names]
+		frequency = [launches.get(command, 0) for name, command in candidates]
+		
+		order = sorted(range(len(names)),
+		               key=(lambda candidateId : (-frequency[candidateId],
+		                                          len(names[candidateId]))))
+		ranks = [0] * len(names)
+		for rank, candidateId in enumerate(order):
+			ranks[candidateId] = rank
+		
+		trigramIds = {}
+		for candidateId, name in enumerate(lowerNames):
+			for trigram in trigrams(name):
+				trigramIds.setdefault(trigram, []).append(candidateId)
+		
+		prefixIds = {}
+		for candidateId in order:
+			prefixes = set()
+			name = lowerNames[candidateId]
+			for word in name.replace("/", " ").replace("-", " ").split():
+				prefixes.add(word[:1])
+				prefixes.add(word[:2])
+			for prefix in prefixes:
+				ids = prefixIds.setdefault(prefix, [])
+				if len(ids) < maxScored:
+					ids.append(candidateId)
+		
+		tables = {
+			"names" : names,
+			"commands" : [command for name, command in candidates],
+			"frequency" : frequency,
+			"order" : packIds(order),
+			"ranks" : packIds(ranks),
+			"masks" : [charMask(name) for name in lowerNames],
+			"trigrams" : dict((trigram, packIds(ids))
+			                  for trigram, ids in trigramIds.items()),
+			"prefixes" : dict((prefix, packIds(ids))
+			                  for prefix, ids in prefixIds.items()),
+		}
+		return SearchIndex(dict((name, marshal.dumps(table))
+		                        for name, table in tables.items()))
+	
+	def dumps(self):
+		return marshal.dumps(self.tables)
+	
+	@staticmethod
+	def loads(data):
+		return SearchIndex(marshal.loads(data))
+	
+	def __prefixMatches(self, query):
+		"""
+		Return the ids of the best ranked candidates with a word starting with
+		query (which must be 1 or 2 characters long).
+		"""
+		return set(unpackIds(self.prefixes.get(query, noIds)))
+	
+	def __trigramMatches(self, query):
+		"""
+		Return the ids of candidates sharing all but (at most) one of the
+		trigrams in query (so that a typo doesn't rule a candidate out).
+		"""
+		postings = sorted((unpackIds(self.trigrams.get(trigram, noIds))
+		                   for trigram in trigrams(query)), key=len)
+		if len(postings) <= 2:
+			matches = set(postings[0])
+			for posting in postings[1:]:
+				matches.intersection_update(posting)
+			return matches
+		
+		# Anything missing at most one trigram must be in one of the two smallest
+		possibleMatches = set(postings[0])
+		possibleMatches.update(postings[1])
+		present = [possibleMatches.intersection(posting) for posting in postings]
+		matches = set()
+		for skipped in range(len(present)):
+			remaining = set(possibleMatches)
+			for i, posting in enumerate(present):
+				if i != skipped:
+					remaining &= posting
+			matches |= remaining
+		return matches
+	
+	def __subsequenceMatches(self, query, limit):
+		"""Return the ids of (up to limit) candidates containing query's chars"""
+		masks = self.masks
+		queryMask = charMask(query)
+		matches = set()
+		for candidateId in self.order:
+			if masks[candidateId] & queryMask == queryMask \
+			   and matchScore(query, self.names[candidateId].lower()) is not None:
+				matches.add(candidateId)
+				if len(matches) >= limit:
+					break
+		return matches
+	
+	def query(self, text, limit=20):
+		"""Return the ids of the best (up to limit) matches for text, best first"""
+		query = text.lower().strip()
+		if query == "":
+			return self.mostFrequent(limit)
+		
+		if len(query) < 3:
+			candidates = self.__prefixMatches(query)
+		else:
+			candidates = self.__trigramMatches(query)
+		if len(candidates) < limit:
+			candidates.update(self.__subsequenceMatches(query, limit))
+		
+		# Only score the most frequently used of a large number of candidates
+		if len(candidates) > maxScored:
+			candidates = heapq.nsmallest(maxScored, candidates,
+			                             key=self.ranks.__getitem__)
+		
+		scored = []
+		for candidateId in candidates:
+			score = matchScore(query, self.names[candidateId].lower())
+			if score is not None:
+				score += frequencyWeight * math.log(1 + self.frequency[candidateId])
+				scored.append((-score, self.ranks[candidateId], candidateId))
+		scored.sort()
+		return [candidateId for _, _, candidateId in scored[:limit]]
+	
+	def mostFrequent(self, limit=None):
+		"""Return the ids of all candidates, most frequently launched first"""
+		return list(self.order[:limit])
+	
+	def command(self, name):
+		"""Return the command for a name (or the name if it isn't known)"""
+		try:
+			return self.commands[self.names.index(name)]
+		except ValueError:
+			return name
+
+def matchScore(query, name):
+	"""
+	Score how well a (lower case) query matches a (lower case) name or return
+	None if it doesn't match at all. Exact and prefix matches score highest,
+	then matches at the start of a word, substrings and finally names which
+	contain the query's characters in order (with fewer gaps scoring higher).
+	"""
+	if name == query:
+		return 1000
+	elif name.startswith(query):
+		return 800 - len(name)
+	position = name.find(query)
+	if position > 0 and not name[position - 1].isalnum():
+		return 600 - position
+	elif position > 0:
+		return 400 - position
+	
+	# Subsequence match
+	gaps = 0
+	position = -1
+	for char in query:
+		nextPosition = name.find(char, position + 1)
+		if nextPosition == -1:
+			return None
+		if position != -1:
+			gaps += nextPosition - position - 1
+		position = nextPosition
+	return 200 - gaps
+
+def getSearchIndex(menuFile="menu", historyFile="yaluExec_history",
+                   indexFile="searchIndex"):
+	"""Load the search index, rebuilding it first if anything has changed"""
+	signature = indexSignature(menuFile, historyFile)
+	try:
+		storedSignature, data = marshal.loads(open(indexFile, "rb").read())
+		if storedSignature == signature:
+			return SearchIndex.loads(data)
+	except (IOError, EOFError, ValueError, TypeError):
+		pass
+	
+	index = SearchIndex.build(menuFile, historyFile)
+	yaluTheme.writeAtomically(indexFile, marshal.dumps((signature,
+	                                                    index.dumps())))
+	return index
+
+def query(text, limit=20):
+	"""Return a list of (name, command) for the best matches for text"""
+	index = getSearchIndex()
+	return [(index.names[candidateId], index.commands[candidateId])
+	        for candidateId in index.query(text, limit)]
+
+################################################################################
+# Commandline behaviour.                                                       #
+################################################################################
+
+def main(argv):
+	# Move into the YALU dir so that all paths from now on can be relative
+	os.chdir(os.environ["LocalYALU"])
+	
+	if len(argv) == 2 and argv[1] == "list":
+		index = getSearchIndex()
+		for candidateId in index.mostFrequent():
+			print(index.names[candidateId])
+	elif len(argv) in (3, 4) and argv[1] == "query":
+		for name, command in query(argv[2], int((argv[3:] or [20])[0])):
+			print(name)
+	elif len(argv) == 3 and argv[1] == "command":
+		print(getSearchIndex().command(argv[2]))
+	else:
+		sys.stderr.write("Usage: yaluSearch {list,query text [limit],command name}\n")
+
+if __name__ == "__main__":
+	main(sys.argv)
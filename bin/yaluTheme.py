@@ -0,0 +1,426 @@
+#!/usr/bin/python
+ ##############################################################################
+################################################################################
+####            YetAnotherLevelUp (YALU), an FVWM Configuration             ####
+####               ~ Jonathan Heathcote                                     ####
+####               ~ September 2009 - Present                               ####
+####               ~ GNU GPLv3                                              ####
+################################################################################
+ ##############################################################################
+# yaluTheme:
+#   Compiles theme files into bundles and prints the FVWM commands needed to
+#   apply them. Syntax:
+#      yaluTheme [force]
+#   Only the commands which differ from the bundle which is currently loaded
+#   are printed unless 'force' is given (e.g. when FVWM has just started).
+#
+#   A bundle is an ordered list of FVWM commands from the theme file (with the
+#   icon set already resolved into absolute ImagePath entries), the window
+#   colours set up by setTheme and the user's per-window colours (see
+#   WindowColours). Each command is filed under a key describing what it sets
+#   (e.g. "colorset 10" or "menustyle * Background") so that only keys whose
+#   command has changed need to be sent again. Menus are only rebuilt if the
+#   icons have changed.
+
+from __future__ import print_function
+
+import sys, os, marshal
+
+################################################################################
+# Bundle keys                                                                  #
+#   The number of words of a command (including the command name) which       #
+#   identify the setting it changes. Commands not listed here are keyed by     #
+#   their entire text.                                                         #
+################################################################################
+keyLengths = {
+	"colorset" : 2,
+	"style" : 3,
+	"menustyle" : 3,
+	"buttonstyle" : 3,
+	"addbuttonstyle" : 3,
+	"titlestyle" : 2,
+	"setbuttonicon" : 2,
+}
+
+# Commands which start (Destroy*) or add to (AddTo*) a multi-line definition
+# which is stored under a single key.
+blockCommands = {
+	"destroymenu" : "menu",
+	"addtomenu" : "menu",
+	"destroyfunc" : "func",
+	"addtofunc" : "func",
+}
+
+# The colorsets windows use unless they have other colours: (hilightColorset,
+# colorset)
+defaultColorsets = (0, 1)
+
+# The colorsets used to colourise each category of window (see setGroupStyle
+# in fvwmConfig): (group, hilightColorset, colorset)
+windowTypeColorsets = [
+	("Editor", 10, 11),
+	("Terminal", 12, 13),
+	("Browser", 14, 15),
+	("Chat", 16, 17),
+	("Multimedia", 18, 19),
+	("Graphics", 20, 21),
+]
+
+# The key under which the icon search path is stored
+imagePathKey = "imagepath"
+
+################################################################################
+# Bundle Object                                                                #
+#   An ordered collection of keyed FVWM commands.                              #
+################################################################################
+class Bundle:
+	def __init__(self, keys=None, commands=None, iconDirectories=None,
+	             source=None):
+		self.keys = keys or []
+		self.commands = commands or {}
+		# The directories searched for icons (in order)
+		self.iconDirectories = iconDirectories or []
+		# Identifies the version of the file the bundle was compiled from (see
+		# getCachedTheme)
+		self.source = source
+	
+	def set(self, key, command):
+		"""Set the command for a key (moving it to the end of the bundle)"""
+		if key in self.commands:
+			self.keys.remove(key)
+		self.keys.append(key)
+		self.commands[key] = command
+	
+	def extend(self, key, command):
+		"""Add another line to a (multi-line) command"""
+		if key in self.commands:
+			self.commands[key] += "\n" + command
+		else:
+			self.set(key, command)
+	
+	def update(self, other):
+		"""Add all of the commands of another bundle to this one"""
+		for key in other.keys:
+			self.set(key, other.commands[key])
+		self.iconDirectories = self.iconDirectories or other.iconDirectories
+	
+	def diff(self, loaded):
+		"""
+		Return a list of the keys whose commands differ from (or are missing in)
+		the loaded bundle.
+		"""
+		return [key for key in self.keys
+		        if loaded.commands.get(key) != self.commands[key]]
+	
+	def save(self, filename):
+		writeAtomically(filename, marshal.dumps({
+			"keys" : self.keys,
+			"commands" : self.commands,
+			"iconDirectories" : self.iconDirectories,
+			"source" : self.source,
+		}))
+	
+	@staticmethod
+	def load(filename):
+		"""Load a saved bundle (or return an empty one if it doesn't exist)"""
+		try:
+			data = marshal.loads(open(filename, "rb").read())
+			return Bundle(data["keys"], data["commands"], data["iconDirectories"],
+			              data.get("source"))
+		except (IOError, EOFError, ValueError, TypeError, KeyError):
+			# Missing, corrupt or saved by another version of Python
+			return Bundle()
+
+def writeAtomically(filename, data):
+	"""Replace a file such that readers never see a partially written file"""
+	if not isinstance(data, bytes):
+		data = data.encode("utf-8")
+	tempFilename = "%s.%i"%(filename, os.getpid())
+	fileObj = open(tempFilename, "wb")
+	fileObj.write(data)
+	fileObj.close()
+	os.rename(tempFilename, filename)
+
+################################################################################
+# Theme compiler                                                               #
+################################################################################
+def commandKey(words):
+	"""Return the bundle key for a command (split into words)"""
+	name = words[0].lower()
+	if name in keyLengths:
+		return " ".join([name] + words[1:keyLengths[name]])
+	else:
+		return " ".join([name] + words[1:])
+
+def readLines(filename):
+	"""Read an FVWM config file joining lines ending with a backslash"""
+	lines = []
+	continuation = ""
+	for line in open(filename, "r").read().split("\n"):
+		if line.endswith("\\"):
+			continuation += line[:-1]
+		else:
+			lines.append(continuation + line)
+			continuation = ""
+	return lines
+
+def compileTheme(filename, yaluDir, imageType):
+	"""Compile a theme file into a Bundle"""
+	bundle = Bundle()
+	
+	# The key of the multi-line definition '+' lines are added to
+	blockKey = None
+	
+	for line in readLines(filename):
+		command = line.strip()
+		if command == "" or command.startswith("#"):
+			continue
+		
+		words = command.split()
+		name = words[0].lower()
+		
+		if name == "+" and blockKey:
+			# Continuation of a menu or function
+			bundle.extend(blockKey, command)
+		elif name in blockCommands and len(words) >= 2:
+			blockKey = "%s %s"%(blockCommands[name], words[1].strip("\""))
+			if name.startswith("destroy"):
+				bundle.set(blockKey, command)
+			else:
+				bundle.extend(blockKey, command)
+		elif name == "seticonset":
+			# Resolve the icon set into the directories to search
+			iconSet = (words[1:] or [""])[0].strip("\"")
+			bundle.iconDirectories = [
+				os.path.join(yaluDir, "themes", iconSet, "icons"),
+				os.path.join(yaluDir, "icons"),
+			]
+			bundle.set(imagePathKey, "\n".join(
+				"ImagePath %s%s;.%s"%(i and "+:" or "", directory, imageType)
+				for i, directory in enumerate(bundle.iconDirectories)
+			))
+			blockKey = None
+		else:
+			bundle.set(commandKey(words), command)
+			blockKey = None
+	
+	return bundle
+
+def getCachedTheme(filename, yaluDir, imageType, cacheDir="themeCache"):
+	"""
+	Return the compiled bundle for a theme, only re-compiling it if the theme
+	file has changed since it was last compiled.
+	"""
+	if not os.path.isdir(cacheDir):
+		os.makedirs(cacheDir)
+	
+	cacheFile = os.path.join(cacheDir, "%s.%s"%(
+		os.path.abspath(filename).replace("/", "_"), imageType))
+	themeStat = os.stat(filename)
+	source = (themeStat.st_mtime, themeStat.st_size, yaluDir)
+	
+	bundle = Bundle.load(cacheFile)
+	if bundle.keys and bundle.source == source:
+		return bundle
+	
+	bundle = compileTheme(filename, yaluDir, imageType)
+	bundle.source = source
+	bundle.save(cacheFile)
+	return bundle
+
+################################################################################
+# Window Colours Object                                                        #
+#   The user's per-window colours. These are kept in the windowColours file   #
+#   with one "window<TAB>backColour<TAB>foreColour" line per window name or    #
+#   class so that a single window's colours can be changed without touching    #
+#   (or re-applying) any of the others.                                        #
+################################################################################
+class WindowColours:
+	# The format of the lines used to store colours in yaluConfig in the past
+	configLineRegex = "AddToFunc userColours I Style \"(.*)\" " \
+	                  "BackColor ([^,]*), ForeColor ([^,]*),.*\n?"
+	
+	def __init__(self, filename="windowColours", configFile="yaluConfig"):
+		self.filename = filename
+		self.configFile = configFile
+		
+		# A dictionary {window: (backColour, foreColour)} and a list of windows in
+		# the order they were added.
+		self.colours = {}
+		self.windows = []
+		
+		try:
+			for line in open(filename, "r").read().split("\n"):
+				if line != "":
+					window, backColour, foreColour = line.split("\t")
+					self.set(window, backColour, foreColour)
+		except IOError:
+			# Import any colours which are still in the user's config file
+			import re
+			for window, backColour, foreColour in re.findall(
+					self.configLineRegex, self.__readConfig()):
+				self.set(window, backColour, foreColour)
+	
+	def __readConfig(self):
+		try:
+			return open(self.configFile, "r").read()
+		except IOError:
+			return ""
+	
+	def set(self, window, backColour, foreColour):
+		if window not in self.colours:
+			self.windows.append(window)
+		self.colours[window] = (backColour, foreColour)
+	
+	def clear(self, window):
+		if window in self.colours:
+			self.windows.remove(window)
+			del self.colours[window]
+	
+	@staticmethod
+	def styleKey(window):
+		"""The bundle key of the style command for a window"""
+		return "style \"%s\""%(window,)
+	
+	def styleCommand(self, window):
+		"""
+		The FVWM command which applies a window's colours (disabling any
+		colorsets, which would otherwise take precedence)
+		"""
+		backColour, foreColour = self.colours[window]
+		return "Style \"%s\" HilightColorset -1, Colorset -1, " \
+		       "BackColor %s, ForeColor %s, HilightBack %s, HilightFore %s"%(
+			window,
+			backColour,
+			foreColour,
+			foreColour,
+			"#000000"
+		)
+	
+	@staticmethod
+	def clearCommand(window):
+		"""
+		The FVWM command which returns a window to the default colours (FVWM
+		can't un-set the colours so the default colorsets, which take precedence
+		over them, are set instead).
+		"""
+		return "Style \"%s\" HilightColorset %i, Colorset %i"%(
+			(window,) + defaultColorsets)
+	
+	def save(self):
+		writeAtomically(self.filename, "".join(
+			"%s\t%s\t%s\n"%((window,) + self.colours[window])
+			for window in self.windows
+		))
+		
+		# Remove any colours imported from the user's config file
+		import re
+		config, noOfReplacements = re.subn(self.configLineRegex, "",
+		                                   self.__readConfig())
+		if noOfReplacements != 0:
+			open(self.configFile, "w").write(config)
+
+################################################################################
+# Window colours                                                               #
+#   The colours applied to windows on top of the theme (formerly applied by    #
+#   setTheme in fvwmConfig).                                                   #
+################################################################################
+def windowColours(prefix):
+	"""
+	Return a Bundle containing the default window colours, the window category
+	colours and the user's per-window colours. The category and user colours are
+	preceded by prefix (the yaluWindowTypeColours option: "" or "Nop").
+	"""
+	bundle = Bundle()
+	
+	def add(key, command):
+		bundle.set(key, ("%s %s"%(prefix, command)).strip())
+	
+	# Default window colours
+	bundle.set("style * HilightColorset",
+	           "Style * HilightColorset %i"%(defaultColorsets[0],))
+	bundle.set("style * Colorset", "Style * Colorset %i"%(defaultColorsets[1],))
+	
+	# Colours for application types
+	for key, command in windowTypeColourStyles():
+		add(key, command)
+	
+	# Colours specified by the user
+	userColours = WindowColours()
+	for window in userColours.windows:
+		add(WindowColours.styleKey(window), userColours.styleCommand(window))
+	
+	return bundle
+
+def windowTypeColourStyles():
+	"""Return a list of (key, command) which colour each category of window"""
+	styles = []
+	for group, hilightColorset, colorset in windowTypeColorsets:
+		styles.append(("setgroupstyle %s HilightColorset"%(group,),
+		               "setGroupStyle %s HilightColorset %i"%(group, hilightColorset)))
+		styles.append(("setgroupstyle %s Colorset"%(group,),
+		               "setGroupStyle %s Colorset %i"%(group, colorset)))
+	return styles
+
+def setLoaded(changes, loadedFile="themeLoaded"):
+	"""
+	Record commands which have been applied outside of applyTheme. Takes a list
+	of (key, command) tuples. If command is None, the key will be applied again
+	by the next applyTheme.
+	"""
+	loaded = Bundle.load(loadedFile)
+	for key, command in changes:
+		if command is not None:
+			loaded.set(key, command)
+		elif key in loaded.commands:
+			loaded.keys.remove(key)
+			del loaded.commands[key]
+	loaded.save(loadedFile)
+
+################################################################################
+# Theme application                                                            #
+################################################################################
+def applyTheme(force=False, loadedFile="themeLoaded"):
+	"""
+	Print the FVWM commands required to apply the current theme, only printing
+	those which differ from the loaded bundle unless force is True.
+	"""
+	bundle = getCachedTheme(os.environ["yaluTheme"],
+	                        os.environ["YALU"],
+	                        os.environ.get("yaluImageType", "png"))
+	bundle.update(windowColours(os.environ.get("yaluWindowTypeColours", "")))
+	
+	if force:
+		loaded = Bundle()
+	else:
+		loaded = Bundle.load(loadedFile)
+	
+	changedKeys = bundle.diff(loaded)
+	for key in changedKeys:
+		print(bundle.commands[key])
+	
+	# Menus must be built when the theme is first applied (fvwmConfig leaves it
+	# to setTheme) but after that only need to be rebuilt if the icons they use
+	# have changed
+	if force or not loaded.keys or imagePathKey in changedKeys:
+		print("reloadAllMenus")
+	
+	bundle.save(loadedFile)
+
+################################################################################
+# Commandline behaviour.                                                       #
+################################################################################
+
+def main(argv):
+	# Move into the YALU dir so that all paths from now on can be relative
+	os.chdir(os.environ["LocalYALU"])
+	
+	if len(argv) == 1:
+		applyTheme()
+	elif len(argv) == 2 and argv[1] == "force":
+		applyTheme(True)
+	else:
+		sys.stderr.write("Usage: yaluTheme [force]\n")
+
+if __name__ == "__main__":
+	main(sys.argv)
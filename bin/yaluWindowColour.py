@@ -13,12 +13,14 @@
 #   Usage:
 #      yaluWindowColour appName [{#color#color,clear}]
 
-import os, sys, commands, re, Tkinter, tkColorChooser
+from __future__ import print_function
+
+import os, sys, subprocess
+import yaluTheme
 
 def FvwmCommand(command):
 	"""Execute a command inside FVWM"""
-	command = command.replace("\"","\\\"")
-	commands.getoutput("FvwmCommand \"%s\""%(command,))
+	subprocess.call(["FvwmCommand", command])
 
 def makeFaint(colour):
 	"""
@@ -38,75 +40,74 @@ def makeFaint(colour):
 
 def setColour(window, bgColour, fgColour):
 	"""
-	Set the window colour (and add it to the user's config file).
+	Set the window colour (and add it to the user's window colours). Only the
+	style for this window is sent to FVWM.
 	"""
-	config = open("yaluConfig", "r").read()
-	
 	# Remove quotations added by FVWM (if present)
 	window = window.strip("'")
 	
-	newConfigLine = "AddToFunc userColours I Style \"%s\" BackColor %s, ForeColor %s, HilightBack %s, HilightFore %s"%(
-		window,
-		bgColour,
-		fgColour,
-		fgColour,
-		"#000000"
-	)
-	
-	# Check the file for a matching old line (if present)
-	regex = "AddToFunc userColours I Style \"%s\" .*"%(window,)
-	config, noOfReplacements = re.subn(regex, newConfigLine, config)
+	userColours = yaluTheme.WindowColours()
+	userColours.set(window, bgColour, fgColour)
+	userColours.save()
 	
-	# Add the new line if no replacement was made above
-	if noOfReplacements == 0:
-		config += "%s\n"%(newConfigLine,)
-	
-	# Send Fvwm command to update function
-	FvwmCommand(newConfigLine)
-	FvwmCommand("setTheme")
-	
-	# Save the new config
-	open("yaluConfig", "w").write(config)
+	# Apply the style (unless window colours are disabled) and record that it has
+	# been applied so that setTheme doesn't send it again.
+	command = ("%s %s"%(
+		os.environ.get("yaluWindowTypeColours", ""),
+		userColours.styleCommand(window)
+	)).strip()
+	FvwmCommand(command)
+	yaluTheme.setLoaded([(yaluTheme.WindowColours.styleKey(window), command)])
 
 def clearColour(window):
-	config = open("yaluConfig", "r").read()
-	
+	"""
+	Remove a window's colours. The window is given the default colours and then
+	the window category colours (which may have included this window) are
+	re-applied by setTheme.
+	"""
 	window = window.strip("'")
 	
-	# Check the file for the matching style and remove it
-	regex = "AddToFunc userColours I Style \"%s\" .*\n?"%(window,)
-	config, noOfReplacements = re.subn(regex, "", config)
+	userColours = yaluTheme.WindowColours()
+	userColours.clear(window)
+	userColours.save()
 	
-	# Save the new config
-	open("yaluConfig", "w").write(config)
-	
-	# Send Fvwm command to re-load the function
-	FvwmCommand("DestroyFunc userColours")
-	FvwmCommand("Read $[LocalYALU]/yaluConfig")
+	FvwmCommand(yaluTheme.WindowColours.clearCommand(window))
+	yaluTheme.setLoaded(
+		[(yaluTheme.WindowColours.styleKey(window), None)] +
+		[(key, None) for key, command in yaluTheme.windowTypeColourStyles()]
+	)
 	FvwmCommand("setTheme")
 
-def askForColours():
+def askForColours(window):
 	"""Present two dialgoues to allow the user to pick a fg and bg colour"""
+	try:
+		import Tkinter, tkColorChooser
+	except ImportError:
+		import tkinter as Tkinter, tkinter.colorchooser as tkColorChooser
+	
 	root = Tkinter.Tk()
 	root.withdraw()
 	_ , bgColour = tkColorChooser.askcolor()
 	if bgColour:
 		_ , fgColour = tkColorChooser.askcolor(makeFaint(bgColour))
 		if fgColour:
-			setColour(sys.argv[1], bgColour, fgColour)
+			setColour(window, bgColour, fgColour)
 
-if __name__ == "__main__":
+def main(argv):
 	# Move into the YALU dir so that all paths from now on can be relative
 	os.chdir(os.environ["LocalYALU"])
 	
-	if len(sys.argv) == 2:
+	if len(argv) == 2:
 		### No Argument ###
-		askForColours()
-	elif len(sys.argv) == 3 and sys.argv[2] == "clear":
+		askForColours(argv[1])
+	elif len(argv) == 3 and argv[2] == "clear":
 		### Clear ###
-			clearColour(sys.argv[1])
-	elif len(sys.argv) == 3:
+			clearColour(argv[1])
+	elif len(argv) == 3:
 		### Provided Colours ###
-		setColour(sys.argv[1], sys.argv[2][:7], sys.argv[2][7:14])
+		setColour(argv[1], argv[2][:7], argv[2][7:14])
 	else:
-		print "Unrecognised Command"
+		print("Unrecognised Command")
+
+if __name__ == "__main__":
+	main(sys.argv)